@@ -38,8 +38,11 @@ else:
     print(f"Superuser '{username}' already exists.")
 EOF
 
+# Unfertige Videos wieder einreihen (doppelte Jobs werden übersprungen)
+python manage.py resume_pipeline
+
 # Starte den RQ Worker im Hintergrund
-python manage.py rqworker default &
+python manage.py rqworker fast maintenance default --with-scheduler &
 
 exec gunicorn video_backend.wsgi:application \
      --bind 0.0.0.0:${PORT:-8000} \
@@ -15,3 +15,42 @@ def django_db_setup():
 def _prepare_test_db(django_db_setup, django_db_blocker):
     with django_db_blocker.unblock():
         call_command("migrate", verbosity=0, run_syncdb=True)
+
+
+@pytest.fixture
+def remote_storage(tmp_path, settings, monkeypatch):
+    """Object-store stand-in (like S3/MinIO: no local ``path()``) as media storage."""
+    from django.core.files.storage import FileSystemStorage, Storage
+
+    class BucketStorage(Storage):
+        def __init__(self, location):
+            self.bucket_dir = location
+            self.fs = FileSystemStorage(location=str(location), allow_overwrite=True)
+
+        def _save(self, name, content):
+            return self.fs._save(name, content)
+
+        def _open(self, name, mode="rb"):
+            return self.fs._open(name, mode)
+
+        def exists(self, name):
+            return self.fs.exists(name)
+
+        def delete(self, name):
+            if (self.bucket_dir / name).is_file():
+                self.fs.delete(name)
+
+        def listdir(self, name):
+            return self.fs.listdir(name) if (self.bucket_dir / name).is_dir() else ([], [])
+
+        def get_available_name(self, name, max_length=None):
+            return name
+
+        def url(self, name):
+            return f"http://minio:9000/bucket/{name}"
+
+    bucket = BucketStorage(tmp_path / "bucket")
+    settings.MEDIA_ROOT = str(tmp_path / "media")
+    settings.VIDEO_SCRATCH_ROOT = str(tmp_path / "scratch")
+    monkeypatch.setattr("videos.storage.default_storage", bucket)
+    return bucket
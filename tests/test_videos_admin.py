@@ -1,4 +1,5 @@
 import pytest
+from pathlib import Path
 from django.contrib.admin.sites import AdminSite
 from django.utils.html import format_html
 
@@ -44,3 +45,131 @@ def test_thumb_tag_with_thumb(video_admin):
         '<img src="{}" style="height:48px;border-radius:4px">', vid.thumb.url
     )
     assert video_admin.thumb_tag(vid) == expected
+
+
+def test_encode_progress_renders_stages(video_admin, monkeypatch):
+    monkeypatch.setattr(
+        "videos.admin.progress.read",
+        lambda pk: {"720p": {"percent": 42.5, "fps": 61.0, "speed": 2.4, "eta": 75}},
+    )
+    vid = Video(pk=1)
+    assert video_admin.encode_progress(vid) == "720p: 42.5 % (61.0 fps, ETA 75 s)"
+    assert video_admin.encode_progress(Video()) == "—"
+
+
+def test_encode_eta_formats_queue_estimate(video_admin, monkeypatch):
+    monkeypatch.setattr(
+        "videos.admin.tasks.queue_eta",
+        lambda pk: {"queue": "feature", "ahead": 2, "seconds": 1500},
+    )
+    vid = Video(pk=1, processing_status=Video.Status.PROBED)
+    assert video_admin.encode_eta(vid) == "in ca. 25 min (Queue feature, 2 Jobs davor)"
+
+    vid.processing_status = Video.Status.READY
+    assert video_admin.encode_eta(vid) == "—"
+
+
+def test_media_summary(video_admin):
+    vid = Video()
+    assert video_admin.media_summary(vid) == "—"
+
+    vid.media_info = {
+        "width": 1920, "height": 1080, "video_codec": "h264", "fps": 25.0,
+        "bit_rate": 6_000_000, "keyframe_interval": 2.0,
+        "audio_codec": "aac", "audio_layout": "stereo",
+    }
+    assert video_admin.media_summary(vid) == (
+        "1920×1080 · h264 25 fps · 6.0 Mbit/s · GOP 2 s · aac stereo"
+    )
+
+
+@pytest.mark.django_db
+def test_video_resource_imports_in_bulk_and_starts_pipelines_once(
+    monkeypatch, django_assert_max_num_queries, django_capture_on_commit_callbacks,
+):
+    import tablib
+
+    from videos.admin import VideoResource
+
+    existing = Video.objects.create(title="Old")
+    scheduled = []
+    monkeypatch.setattr("videos.signals.enqueue_stage", lambda *a: pytest.fail("signal fired"))
+    monkeypatch.setattr("videos.admin.tasks.schedule_waiting_pipelines", lambda: scheduled.append(1))
+
+    dataset = tablib.Dataset(headers=["id", "title", "video_file"])
+    dataset.append([existing.pk, "Renamed", ""])
+    for i in range(20):
+        dataset.append(["", f"Film {i}", f"videos/import/film_{i}.mp4"])
+
+    with django_capture_on_commit_callbacks(execute=True):
+        with django_assert_max_num_queries(12):
+            result = VideoResource().import_data(dataset, dry_run=False, use_transactions=True)
+
+    assert not result.has_errors()
+    assert Video.objects.get(pk=existing.pk).title == "Renamed"
+    assert Video.objects.filter(processing_stage="ingest").count() == 20
+    assert scheduled == [1]
+
+
+@pytest.mark.django_db
+def test_video_resource_streams_csv_rows():
+    from videos.admin import VideoResource
+
+    Video.objects.create(title="A")
+    Video.objects.create(title="B")
+
+    lines = list(VideoResource().stream_csv(Video.objects.order_by("pk")))
+
+    assert len(lines) == 3
+    assert lines[0].startswith("id,")
+    assert ",A," in lines[1] and ",B," in lines[2]
+
+
+@pytest.mark.django_db
+def test_admin_upload_streams_original_once(admin_client, settings, tmp_path, monkeypatch):
+    from django.core.files.uploadedfile import SimpleUploadedFile
+    from django.urls import reverse
+
+    from videos.hashing import new_hasher
+
+    settings.DATABASES["default"].setdefault("ATOMIC_REQUESTS", False)
+    settings.MEDIA_ROOT = str(tmp_path)
+    monkeypatch.setattr("videos.signals.enqueue_stage", lambda *a, **kw: None)
+    monkeypatch.setattr(
+        "videos.signals.file_digest", lambda f: pytest.fail("hashed twice"),
+    )
+    content = b"\x00\x00\x00\x18ftypmp42" + b"\x01" * 200_000
+    url = reverse("admin:videos_video_add")
+
+    resp = admin_client.post(url, {
+        "title": "Clip",
+        "title_de": "Clip",
+        "category": Video.Category.NEW,
+        "video_file": SimpleUploadedFile("clip.mp4", content),
+    })
+    assert resp.status_code == 302
+
+    video = Video.objects.get()
+    assert video.video_file.name.startswith("videos/uploads/")
+    assert Path(video.video_file.path).read_bytes() == content
+    hasher = new_hasher()
+    hasher.update(content)
+    assert video.content_hash == hasher.hexdigest()
+    assert not (tmp_path / "videos" / "tmp").exists()
+
+    bad = admin_client.post(url, {
+        "title": "Fake",
+        "title_de": "Fake",
+        "category": Video.Category.NEW,
+        "video_file": SimpleUploadedFile("fake.mp4", b"%PDF-1.7" + b"x" * 100),
+    })
+    assert bad.status_code == 200
+    assert Video.objects.count() == 1
+    assert len(list((tmp_path / "videos" / "uploads").iterdir())) == 1
+
+    invalid = admin_client.post(url, {
+        "title": "Clip",
+        "video_file": SimpleUploadedFile("clip.mp4", content),
+    })
+    assert invalid.status_code == 200  # category missing: the streamed file goes
+    assert len(list((tmp_path / "videos" / "uploads").iterdir())) == 1
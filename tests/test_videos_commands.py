@@ -0,0 +1,105 @@
+import os
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+
+from videos.models import ChunkedUpload, Video
+
+SOURCE = {
+    "width": 1280, "height": 720, "fps": 25.0, "bit_rate": 3_000_000,
+    "video_codec": "h264", "audio_codec": "aac", "duration": 42.4,
+}
+
+
+@pytest.mark.django_db
+def test_ingest_videos_bulk_creates_once_and_enqueues_in_batches(tmp_path, settings, monkeypatch):
+    settings.MEDIA_ROOT = str(tmp_path / "media")
+    library = tmp_path / "library"
+    library.mkdir()
+    (library / "first_film.mp4").write_bytes(b"one")
+    (library / "second.mkv").write_bytes(b"two")
+    (library / "copy.mp4").write_bytes(b"one")
+    (library / "notes.txt").write_text("skip me")
+
+    probed, queued = [], []
+    monkeypatch.setattr("videos.tasks.probe", lambda path: probed.append(path.name) or dict(SOURCE))
+    monkeypatch.setattr(
+        "videos.tasks.enqueue_stage", lambda func, video_id: queued.append(video_id),
+    )
+    monkeypatch.setattr("videos.signals.enqueue_stage", lambda *a: pytest.fail("signal fired"))
+    monkeypatch.setattr(
+        "videos.tasks.time.sleep", lambda s: None,
+    )
+
+    call_command("ingest_videos", str(library), "--enqueue-batch", "1")
+
+    videos = Video.objects.order_by("pk")
+    # first_film.mp4 has the same content as copy.mp4 and is imported once
+    assert [v.title for v in videos] == ["copy", "second"]
+    assert sorted(queued) == sorted(v.pk for v in videos)
+    first = videos[0]
+    assert first.processing_stage == "ingest"
+    assert first.duration == 42
+    assert first.media_info["video_codec"] == "h264"
+    assert first.video_file.name.startswith("videos/ingest/")
+    assert (tmp_path / "media" / first.video_file.name).read_bytes() == b"one"
+
+    queued.clear()
+    probed.clear()
+    call_command("ingest_videos", str(library))
+    assert Video.objects.count() == 2
+    assert sorted(queued) == sorted(v.pk for v in videos)  # still in the ingest stage
+    assert probed == []  # known content is only hashed
+
+
+@pytest.mark.django_db
+def test_gc_media_deletes_only_old_unreferenced_files(tmp_path, settings, django_user_model):
+    settings.MEDIA_ROOT = str(tmp_path)
+    user = django_user_model.objects.create_user(email="u@example.com", password="pw")
+    stale = ChunkedUpload.objects.create(user=user, filename="old.mp4", size=10)
+    active = ChunkedUpload.objects.create(user=user, filename="new.mp4", size=10)
+    media = {
+        "videos/1/orig.mp4": True,
+        "videos/1/orig_720p.mp4": True,
+        "videos/1/hls/720p/seg_00001.m4s": True,
+        "thumbs/1/thumb.png": True,
+        "thumbs/1/thumb.webp": True,
+        "hero/1/hero.avif": True,
+        f"{stale.name}": False,
+        "videos/1/orig_1080p.part.mp4": False,
+        "videos/tmp/leftover.mp4": False,
+        "thumbs/7/thumb.png": False,
+        "videos/2/busy_720p.mp4": True,
+    }
+    for rel in media:
+        path = tmp_path / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"x")
+        os.utime(path, (0, 0))
+    fresh = tmp_path / "videos" / "tmp" / "uploading.mp4"
+    fresh.write_bytes(b"x")
+    active.path.parent.mkdir(parents=True)
+    active.path.write_bytes(b"x")
+
+    Video.objects.bulk_create([
+        Video(
+            pk=1, title="A", video_file="videos/1/orig.mp4",
+            processing_status=Video.Status.READY,
+            source_variants=[{"path": "videos/1/orig_720p.mp4", "height": 720}],
+            hls_playlist="videos/1/hls/master.m3u8", thumb="thumbs/1/thumb.png",
+        ),
+        Video(pk=2, title="B", processing_status=Video.Status.ENCODING),
+    ])
+
+    out = StringIO()
+    call_command("gc_media", "--dry-run", stdout=out)
+    assert "4 verwaist gefunden" in out.getvalue()
+    assert (tmp_path / "videos" / "tmp" / "leftover.mp4").exists()
+
+    call_command("gc_media", "--batch-size", "2", stdout=StringIO())
+    for rel, kept in media.items():
+        assert (tmp_path / rel).exists() == kept, rel
+    assert fresh.exists() and active.path.exists()
+    assert not (tmp_path / "thumbs" / "7").exists()
+    assert list(ChunkedUpload.objects.values_list("pk", flat=True)) == [active.pk]
@@ -0,0 +1,40 @@
+import pytest
+
+from videos import estimates
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    def hget(self, key, field):
+        return self.data.get(key, {}).get(field.encode())
+
+    def hset(self, key, field, value):
+        self.data.setdefault(key, {})[field.encode()] = str(value).encode()
+
+    def hgetall(self, key):
+        return self.data.get(key, {})
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    fake = FakeRedis()
+    monkeypatch.setattr("videos.estimates.get_connection", lambda: fake)
+    monkeypatch.setattr("videos.estimates.socket.gethostname", lambda: "worker-1")
+    return fake
+
+
+def test_speed_defaults_until_measured(redis):
+    assert estimates.speed() == estimates.DEFAULT_SPEED
+    assert estimates.record(0, 10) is None
+
+
+def test_record_keeps_moving_average_per_host(redis):
+    assert estimates.record(1000, 10) == 100.0
+    assert estimates.record(2000, 10) == pytest.approx(130.0)
+
+    redis.hset(estimates.SPEED_KEY, "pi", 10.0)
+    assert estimates.speeds() == {"worker-1": pytest.approx(130.0), "pi": 10.0}
+    assert estimates.speed(slowest=True) == 10.0
+    assert estimates.speed() == pytest.approx(70.0)
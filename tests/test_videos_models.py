@@ -67,6 +67,24 @@ def test_variants_ready_and_get_variant():
     assert set(v.get_variant(h) for h in (360, 720)) == {"p360.mp4", "p720.mp4"}
 
 
+def test_variants_ready_follows_top_rendition():
+    v = Video(title="Ladder")
+
+    # 480p source: top rung is 360p, nothing above is required
+    v.source_variants = [
+        {"path": "p360.mp4", "height": 360, "top": True},
+        {"path": "p240.mp4", "height": 240, "top": False},
+    ]
+    assert v.variants_ready is True
+
+    # 1080p source still needs 720p and 360p below the top rung
+    v.source_variants = [
+        {"path": "p1080.mp4", "height": 1080, "top": True},
+        {"path": "p360.mp4", "height": 360, "top": False},
+    ]
+    assert v.variants_ready is False
+
+
 @pytest.mark.django_db
 def test_watchprogress_str_and_unique():
     user = CustomUser.objects.create_user(email="u@x.de", password="pw")
@@ -0,0 +1,40 @@
+import pytest
+
+from videos import progress
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    def hset(self, key, field, value):
+        self.data.setdefault(key, {})[field.encode()] = value.encode()
+
+    def hgetall(self, key):
+        return self.data.get(key, {})
+
+    def expire(self, key, ttl):
+        pass
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    fake = FakeRedis()
+    monkeypatch.setattr("videos.progress.get_connection", lambda: fake)
+    return fake
+
+
+def test_publish_read_and_clear(redis):
+    progress.publish(3, "720p", {"percent": 40.0, "fps": 30.0, "speed": 1.2, "eta": 90})
+    progress.publish(3, "hls", {"percent": 100.0, "fps": 0.0, "speed": 0.0, "eta": 0})
+
+    stages = progress.read(3)
+    assert stages["720p"]["percent"] == 40.0
+    assert set(stages) == {"720p", "hls"}
+    assert progress.read(4) == {}
+
+    progress.clear(3)
+    assert progress.read(3) == {}
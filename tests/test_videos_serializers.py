@@ -94,3 +94,44 @@ def test_progress_serializer_and_str():
     assert data["position"] == 5
     assert data["duration"] == 50
     assert "updated" in data
+
+
+def test_get_hls_url():
+    v = Video()
+    req = DummyRequest("http://testserver", "de")
+    assert VideoSerializer(context={"request": req}).get_hls_url(v) is None
+
+    v.hls_playlist = "videos/3/hls/master.m3u8"
+    assert VideoSerializer(context={"request": req}).get_hls_url(v) == \
+        "http://testserver" + settings.MEDIA_URL + "videos/3/hls/master.m3u8"
+
+
+def test_get_trickplay_url():
+    v = Video()
+    req = DummyRequest("http://testserver", "de")
+    assert VideoSerializer(context={"request": req}).get_trickplay_url(v) is None
+
+    v.trickplay_vtt = "videos/3/trickplay/thumbs.vtt"
+    assert VideoSerializer(context={"request": req}).get_trickplay_url(v) == \
+        "http://testserver" + settings.MEDIA_URL + "videos/3/trickplay/thumbs.vtt"
+
+
+def test_urls_are_signed_when_secret_is_set(settings):
+    from videos import signing
+
+    settings.MEDIA_SIGNING_SECRET = "s3cret"
+    v = Video()
+    v.source_url = ""
+    v.video_file = SimpleNamespace(name="videos/3/foo.mp4", url="/media/videos/3/foo.mp4")
+    v.hls_playlist = "videos/3/hls/master.m3u8"
+    v.trickplay_vtt = "videos/3/trickplay/thumbs.vtt"
+    ser = VideoSerializer(context={"request": DummyRequest("http://testserver", "de")})
+
+    for url, rel in (
+        (ser.get_video_file_url(v), "videos/3/foo.mp4"),
+        (ser.get_hls_url(v), "videos/3/hls/master.m3u8"),
+        (ser.get_trickplay_url(v), "videos/3/trickplay/thumbs.vtt"),
+    ):
+        token, expires, path = url.removeprefix("http://testserver/secure/").split("/", 2)
+        assert path == rel
+        assert token == signing.sign("videos/3", int(expires), "s3cret")
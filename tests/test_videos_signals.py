@@ -1,14 +1,16 @@
 import pytest
 from pathlib import Path
 from django.conf import settings
+from django.core.files.base import ContentFile
 
-from videos.signals import enqueue_pipeline, cleanup_files
-from videos.tasks import create_variants
+from videos.signals import cancel_jobs, enqueue_pipeline, cleanup_files
+from videos.tasks import probe_source, purge_paths
 
 
 class DummyFile:
-    def __init__(self, path):
+    def __init__(self, path, name=None):
         self.path = path
+        self.name = name or path
 
 
 class DummyVideo:
@@ -17,19 +19,25 @@ class DummyVideo:
         self.video_file = video_file
         self.source_url = source_url
         self.source_variants = source_variants
+        self.content_hash = ""
+        self.hls_playlist = self.trickplay_vtt = None
+        self.thumb = self.hero_frame = None
 
 
-def test_enqueue_pipeline_calls_enqueue(monkeypatch):
+@pytest.mark.django_db
+def test_enqueue_pipeline_calls_enqueue(monkeypatch, django_capture_on_commit_callbacks):
     called = {}
 
-    def fake_enqueue(func, vid, job_timeout):
-        called["args"] = (func, vid, job_timeout)
+    def fake_enqueue(func, vid):
+        called["args"] = (func, vid)
 
-    monkeypatch.setattr("videos.signals.enqueue", fake_enqueue)
+    monkeypatch.setattr("videos.signals.enqueue_stage", fake_enqueue)
 
     video = DummyVideo(id=42, video_file=DummyFile("dummy"))
-    enqueue_pipeline(sender=None, instance=video, created=True)
-    assert called["args"] == (create_variants, 42, 7200)
+    with django_capture_on_commit_callbacks(execute=True):
+        enqueue_pipeline(sender=None, instance=video, created=True)
+        assert called == {}
+    assert called["args"] == (probe_source, 42)
 
 
 def test_enqueue_pipeline_no_enqueue_when_not_created_or_no_file(monkeypatch):
@@ -38,7 +46,7 @@ def test_enqueue_pipeline_no_enqueue_when_not_created_or_no_file(monkeypatch):
     def fake_enqueue(*args, **kwargs):
         called["count"] += 1
 
-    monkeypatch.setattr("videos.signals.enqueue", fake_enqueue)
+    monkeypatch.setattr("videos.signals.enqueue_stage", fake_enqueue)
 
     # Not created
     v1 = DummyVideo(id=1, video_file=DummyFile("x"))
@@ -51,9 +59,11 @@ def test_enqueue_pipeline_no_enqueue_when_not_created_or_no_file(monkeypatch):
     assert called["count"] == 0
 
 
-def test_cleanup_files_removes_all(tmp_path, monkeypatch):
-    # Arrange: override MEDIA_ROOT
+@pytest.mark.django_db
+def test_cleanup_files_removes_all(tmp_path, monkeypatch, django_capture_on_commit_callbacks):
+    # Arrange: override MEDIA_ROOT, purge inline instead of via the worker
     monkeypatch.setattr(settings, "MEDIA_ROOT", str(tmp_path))
+    monkeypatch.setattr("videos.signals.purge_later", purge_paths)
 
     # Create dummy file paths
     base = tmp_path
@@ -72,13 +82,16 @@ def test_cleanup_files_removes_all(tmp_path, monkeypatch):
 
     video = DummyVideo(
         id=5,
-        video_file=DummyFile(str(orig)),
+        video_file=DummyFile(str(orig), "videos/5/orig.mp4"),
         source_url="videos/5/variant.mp4",
         source_variants=[{"path": "videos/5/720.mp4", "height": 720}],
     )
 
-    # Act
-    cleanup_files(sender=None, instance=video)
+    # Act: nothing is touched before the transaction commits
+    with django_capture_on_commit_callbacks(execute=True) as callbacks:
+        cleanup_files(sender=None, instance=video)
+        assert orig.exists()
+    assert len(callbacks) == 1
 
     # Assert files removed
     assert not orig.exists()
@@ -88,3 +101,96 @@ def test_cleanup_files_removes_all(tmp_path, monkeypatch):
     # Assert directories removed
     assert not thumb_dir.exists()
     assert not hero_dir.exists()
+
+
+@pytest.mark.django_db
+def test_cancel_jobs_cancels_pipeline_after_commit(monkeypatch, django_capture_on_commit_callbacks):
+    cancelled = []
+    monkeypatch.setattr("videos.signals.cancel_pipeline", cancelled.append)
+
+    with django_capture_on_commit_callbacks(execute=True) as callbacks:
+        cancel_jobs(sender=None, instance=DummyVideo(id=9))
+        assert cancelled == []
+
+    assert len(callbacks) == 1
+    assert cancelled == [9]
+
+
+@pytest.mark.django_db
+def test_cancel_jobs_wakes_duplicates_waiting_on_deleted_video(
+    monkeypatch, django_capture_on_commit_callbacks,
+):
+    woken = []
+    monkeypatch.setattr("videos.signals.cancel_pipeline", lambda video_id: 0)
+    monkeypatch.setattr("videos.signals.wake_twins", woken.append)
+    video = DummyVideo(id=9)
+    video.content_hash = "abc"
+
+    with django_capture_on_commit_callbacks(execute=True):
+        cancel_jobs(sender=None, instance=video)
+
+    assert woken == ["abc"]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_rolled_back_delete_keeps_pipeline(monkeypatch):
+    from django.db import transaction
+    from videos.models import Video
+
+    cancelled = []
+    monkeypatch.setattr("videos.signals.cancel_pipeline", cancelled.append)
+    monkeypatch.setattr("videos.signals.enqueue_stage", lambda *a, **kw: None)
+    video = Video.objects.create(title="Clip", video_file="videos/tmp/clip.mp4")
+    pk = video.pk
+
+    with pytest.raises(RuntimeError), transaction.atomic():
+        video.delete()
+        raise RuntimeError("rollback")
+
+    assert Video.objects.filter(pk=pk).exists()
+    assert cancelled == []
+
+
+@pytest.mark.django_db
+def test_hash_upload_and_reference_counted_cleanup(
+    tmp_path, settings, monkeypatch, django_capture_on_commit_callbacks,
+):
+    from videos.models import Video
+
+    settings.MEDIA_ROOT = str(tmp_path)
+    monkeypatch.setattr("videos.signals.purge_later", purge_paths)
+    monkeypatch.setattr("videos.signals.enqueue_stage", lambda *a, **kw: None)
+    monkeypatch.setattr("videos.signals.cancel_pipeline", lambda video_id: 0)
+    rendition = tmp_path / "videos" / "1" / "a_720p.mp4"
+    rendition.parent.mkdir(parents=True)
+    rendition.write_bytes(b"\x00")
+
+    first = Video.objects.create(title="A", video_file=ContentFile(b"same content", name="a.mp4"))
+    second = Video.objects.create(title="B", video_file=ContentFile(b"same content", name="b.mp4"))
+    assert first.content_hash == second.content_hash != ""
+    assert first.video_file.name == "videos/tmp/a.mp4"
+
+    Video.objects.filter(pk__in=[first.pk, second.pk]).update(
+        source_url="videos/1/a_720p.mp4",
+    )
+    with django_capture_on_commit_callbacks(execute=True):
+        Video.objects.get(pk=first.pk).delete()
+    assert rendition.exists()
+    assert not (tmp_path / "videos" / "tmp" / "a.mp4").exists()
+
+    with django_capture_on_commit_callbacks(execute=True):
+        Video.objects.get(pk=second.pk).delete()
+    assert not rendition.exists()
+
+
+@pytest.mark.django_db
+def test_hash_upload_leaves_stored_paths_to_the_worker(monkeypatch):
+    from videos.models import Video
+
+    monkeypatch.setattr("videos.signals.enqueue_stage", lambda *a, **kw: None)
+    monkeypatch.setattr("videos.signals.file_digest", lambda f: pytest.fail("hashed in request"))
+
+    video = Video.objects.create(title="A", video_file="videos/uploads/aaa/film.mp4")
+    video.save(update_fields=["processing_stage"])
+
+    assert video.content_hash == ""
@@ -0,0 +1,100 @@
+import base64
+import hashlib
+import re
+from pathlib import Path
+
+from videos import signing
+from videos.models import Video
+from videos.serializers import VideoSerializer
+
+
+class DummyRequest:
+    LANGUAGE_CODE = "de"
+
+    def build_absolute_uri(self, path):
+        return f"http://testserver{path}"
+
+
+def test_sign_matches_nginx_secure_link_md5():
+    expected = base64.urlsafe_b64encode(
+        hashlib.md5(b"1700000000videos/4 s3cret").digest()
+    ).rstrip(b"=").decode()
+
+    assert signing.sign("videos/4", 1700000000, "s3cret") == expected
+
+
+def test_signed_path_scopes_token_to_video_directory(settings, monkeypatch):
+    settings.MEDIA_SIGNING_SECRET = "s3cret"
+    monkeypatch.setattr(signing, "URL_TTL", 3600)
+
+    master = signing.signed_path("videos/4/hls/master.m3u8", now=1_000_000)
+    segment = signing.signed_path("videos/4/hls/720p/seg_00001.m4s", now=1_000_000)
+
+    token, expires, rel = master.removeprefix("/secure/").split("/", 2)
+    assert int(expires) % signing.EXPIRY_STEP == 0 and int(expires) >= 1_003_600
+    assert rel == "videos/4/hls/master.m3u8"
+    assert token == signing.sign("videos/4", int(expires))
+    assert segment.rsplit("/hls/", 1)[0] == master.rsplit("/hls/", 1)[0]
+
+
+def test_serializer_emits_signed_urls_when_secret_is_set(settings):
+    settings.MEDIA_SIGNING_SECRET = "s3cret"
+    v = Video(hls_playlist="videos/4/hls/master.m3u8", thumb="thumbs/4/thumb.png")
+    v.source_variants = [{"path": "videos/4/clip_720p.mp4", "height": 720}]
+    ser = VideoSerializer(context={"request": DummyRequest()})
+
+    assert ser.get_hls_url(v).startswith("http://testserver/secure/")
+    assert ser.get_sources(v)[0]["src"].endswith("/videos/4/clip_720p.mp4")
+    assert "/secure/" in signing.file_url(DummyRequest(), v.thumb)
+
+
+def nginx_secure_location():
+    """The ``/secure/`` location regex of the shipped nginx config."""
+    conf = Path(__file__).resolve().parents[1] / "ops" / "nginx" / "videoflix.nginx.conf"
+    pattern = re.search(r"location ~ (\^/secure/\S+) \{", conf.read_text()).group(1)
+    return re.compile(pattern.replace("(?<", "(?P<"))
+
+
+def test_upload_tokens_cover_a_single_original(settings):
+    settings.MEDIA_SIGNING_SECRET = "s3cret"
+    first = signing.signed_path("videos/uploads/aaa/film.mp4", now=0)
+    other = signing.signed_path("videos/uploads/bbb/film.mp4", now=0)
+
+    assert signing.scope_of("videos/uploads/aaa/film.mp4") == "videos/uploads/aaa"
+    assert signing.scope_of("videos/ingest/f00/film.mp4") == "videos/ingest/f00"
+    assert signing.scope_of("videos/tmp/film.mp4") == "videos/tmp/film.mp4"
+    assert first.split("/")[2] != other.split("/")[2]
+
+
+def test_nginx_location_uses_the_same_scope():
+    location = nginx_secure_location()
+    for rel in (
+        "videos/4/hls/720p/seg_00001.m4s",
+        "thumbs/4/thumb.png",
+        "videos/uploads/aaa/film.mp4",
+        "videos/ingest/f00/film.mp4",
+        "videos/tmp/film.mp4",
+    ):
+        match = location.match(f"/secure/tok-en/3600/{rel}")
+        assert match["sl_scope"] == signing.scope_of(rel)
+        assert match["sl_scope"] + (match["sl_file"] or "") == rel
+
+
+def test_serializer_signs_the_original_too(settings):
+    settings.MEDIA_SIGNING_SECRET = "s3cret"
+    v = Video(pk=4, title="A", video_file="videos/uploads/aaa/film.mp4")
+
+    rep = VideoSerializer(v, context={"request": DummyRequest()}).data
+
+    assert rep["video_file"].startswith("http://testserver/secure/")
+    assert rep["video_file"].endswith("/videos/uploads/aaa/film.mp4")
+
+
+def test_missing_signing_secret_fails_the_system_check(settings):
+    from videos.checks import media_signing_secret
+
+    settings.DEBUG, settings.MEDIA_SIGNING_SECRET = False, ""
+    assert [e.id for e in media_signing_secret(None)] == ["videos.E001"]
+
+    settings.MEDIA_SIGNING_SECRET = "s3cret"
+    assert media_signing_secret(None) == []
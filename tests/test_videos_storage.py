@@ -0,0 +1,69 @@
+from videos import signing, storage
+
+
+def test_local_storage_writes_in_place(tmp_path, settings):
+    settings.MEDIA_ROOT = str(tmp_path)
+    out = storage.local_path("videos", "1", "clip_720p.mp4")
+    out.parent.mkdir(parents=True)
+    out.write_bytes(b"x")
+
+    assert not storage.is_remote()
+    assert out == tmp_path / "videos" / "1" / "clip_720p.mp4"
+    assert storage.input_path("videos/1/clip_720p.mp4") == str(out)
+    storage.publish(out)
+    assert out.exists()
+
+
+def test_publish_uploads_outputs_and_clears_scratch(remote_storage, tmp_path):
+    hls = storage.local_path("videos", "4", "hls")
+    (hls / "720p").mkdir(parents=True)
+    (hls / "master.m3u8").write_text("#EXTM3U\n")
+    (hls / "720p" / "seg_00001.m4s").write_bytes(b"seg")
+
+    assert storage.is_remote()
+    assert storage.scratch_root() == tmp_path / "scratch"
+    storage.publish(hls)
+
+    assert not hls.exists()
+    assert (remote_storage.bucket_dir / "videos/4/hls/720p/seg_00001.m4s").read_bytes() == b"seg"
+    assert storage.exists(hls / "master.m3u8")
+    assert storage.input_path("videos/4/hls/master.m3u8") == (
+        "http://minio:9000/bucket/videos/4/hls/master.m3u8"
+    )
+
+    storage.remove("videos/4")
+    assert not storage.exists(hls / "master.m3u8")
+
+
+def test_media_urls_come_from_remote_storage(remote_storage, settings):
+    settings.MEDIA_SIGNING_SECRET = "s3cret"
+
+    class Request:
+        def build_absolute_uri(self, path):
+            return f"http://testserver{path}"
+
+    url = signing.media_url(Request(), "videos/4/clip_720p.mp4")
+    assert url == "http://minio:9000/bucket/videos/4/clip_720p.mp4"
+
+
+def test_hls_and_trickplay_links_are_unsigned_public_urls(remote_storage, settings, monkeypatch):
+    class PublicBucket:
+        def url(self, name):
+            return f"http://minio:9000/bucket/{name}"
+
+    settings.STORAGES = {**settings.STORAGES, "public_media": {"BACKEND": "public"}}
+    monkeypatch.setattr(storage, "storages", {"public_media": PublicBucket()})
+    monkeypatch.setattr(remote_storage, "url", lambda name: f"http://minio/{name}?X-Amz-Signature=x")
+
+    assert storage.url("videos/4/hls/master.m3u8") == "http://minio:9000/bucket/videos/4/hls/master.m3u8"
+    assert storage.url("videos/4/trickplay/thumbs.vtt").endswith("/videos/4/trickplay/thumbs.vtt")
+    assert "X-Amz-Signature" in storage.url("videos/4/clip_720p.mp4")
+    assert "X-Amz-Signature" in storage.url("videos/uploads/aaa/film.mp4")
+
+
+def test_bucket_policy_opens_exactly_the_public_dirs(settings):
+    import json
+
+    policy = settings.BASE_DIR / "ops" / "minio" / "public-read.json"
+    resources = json.loads(policy.read_text())["Statement"][0]["Resource"]
+    assert resources == [f"arn:aws:s3:::BUCKET/videos/*/{d}/*" for d in storage.PUBLIC_DIRS]
@@ -1,4 +1,7 @@
 import pytest
+from pathlib import Path
+from types import SimpleNamespace
+from django.core.files.base import ContentFile
 from videos.models import Video
 
 @pytest.fixture
@@ -18,3 +21,995 @@ def video_instance():
         source_url=None,  # Initialized as None to test various cases
         source_variants=None
     )
+
+
+SOURCE_1080P = {
+    "width": 1920, "height": 1080, "fps": 25.0, "bit_rate": 6_000_000,
+    "video_codec": "h264", "pix_fmt": "yuv420p", "audio_codec": "aac",
+    "audio_channels": 2, "format_name": "mov,mp4,m4a,3gp,3g2,mj2", "duration": 60.0,
+    "keyframe_interval": 2.0,
+}
+
+
+def recording_run(calls):
+    """Fake ``tasks.run`` that records commands and touches their outputs."""
+    def fake_run(cmd, **kwargs):
+        calls.append(cmd)
+        for arg in cmd[1:]:
+            for part in arg.split("|"):
+                out = Path(part.rsplit("]", 1)[-1])
+                if ".part." in out.name and out.parent.is_dir():
+                    out.touch()
+    return fake_run
+
+
+def fake_queues(monkeypatch, enqueue):
+    """Send ``get_queue(name).enqueue`` of the tasks module to *enqueue*."""
+    monkeypatch.setattr(
+        "videos.tasks.get_queue",
+        lambda name="default": SimpleNamespace(name=name, enqueue=enqueue),
+    )
+
+
+class FakeLock:
+    def __init__(self, held, name):
+        self.held, self.name = held, name
+
+    def acquire(self, blocking=True):
+        if self.name in self.held:
+            return False
+        self.held.add(self.name)
+        return True
+
+    def release(self):
+        self.held.discard(self.name)
+
+
+class FakeLockRedis:
+    """Minimal Redis stand-in: non-blocking locks, flags and sets."""
+
+    def __init__(self, held=None):
+        self.held = held if held is not None else set()
+        self.data = {}
+
+    def lock(self, name, timeout=None):
+        return FakeLock(self.held, name)
+
+    def set(self, key, value, ex=None, nx=False):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        return True
+
+    def exists(self, key):
+        return int(key in self.data)
+
+    def sadd(self, key, member):
+        self.data.setdefault(key, set()).add(member)
+
+    def smembers(self, key):
+        return set(self.data.get(key, ()))
+
+    def expire(self, key, ttl):
+        pass
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+    def hget(self, key, field):
+        return self.data.get(key, {}).get(field)
+
+    def hset(self, key, field, value):
+        self.data.setdefault(key, {})[field] = value
+
+    def hgetall(self, key):
+        return dict(self.data.get(key, {}))
+
+    def rpush(self, key, *values):
+        self.data.setdefault(key, []).extend(values)
+
+    def lpop(self, key, count):
+        items = self.data.get(key, [])
+        batch, self.data[key] = items[:count], items[count:]
+        return batch or None
+
+
+@pytest.fixture
+def uploaded_video(tmp_path, monkeypatch, settings):
+    """Saved Video whose original lives in a temporary MEDIA_ROOT."""
+    settings.MEDIA_ROOT = str(tmp_path)
+    fake_queues(monkeypatch, lambda *a, **kw: None)
+    monkeypatch.setattr("videos.tasks.active_job", lambda job_id: None)
+    redis = FakeLockRedis()
+    monkeypatch.setattr("videos.tasks.get_connection", lambda: redis)
+    monkeypatch.setattr("videos.estimates.get_connection", lambda: redis)
+    monkeypatch.setattr("videos.tasks.probe", lambda src: dict(SOURCE_1080P))
+
+    src = tmp_path / "videos" / "tmp" / "clip.mp4"
+    src.parent.mkdir(parents=True)
+    src.write_bytes(b"\x00")
+    return Video.objects.create(title="Clip", video_file="videos/tmp/clip.mp4")
+
+
+@pytest.mark.django_db
+def test_create_variants_single_pass_decodes_once(uploaded_video, monkeypatch):
+    from videos import tasks
+
+    calls = []
+    monkeypatch.setattr(tasks, "TRANSCODE_MODE", "single")
+    monkeypatch.setattr(tasks, "probe", lambda src: {**SOURCE_1080P, "video_codec": "hevc"})
+    monkeypatch.setattr(tasks, "run", recording_run(calls))
+
+    tasks.create_variants(uploaded_video.id)
+
+    assert len(calls) == 1
+    cmd = calls[0]
+    assert cmd.count("-i") == 1
+    assert "split=4" in cmd[cmd.index("-filter_complex") + 1]
+    assert cmd[cmd.index("-f") + 1] == "tee"
+    assert cmd[-1].count("|") == 3
+
+    uploaded_video.refresh_from_db()
+    heights = [v["height"] for v in uploaded_video.source_variants]
+    assert heights == [1080, 720, 360, 240]
+    assert uploaded_video.source_variants[0]["top"] is True
+    assert uploaded_video.source_url.endswith("clip_720p.mp4")
+
+
+@pytest.mark.django_db
+def test_create_variants_serial_mode_runs_per_rendition(uploaded_video, monkeypatch):
+    from videos import tasks
+
+    calls = []
+    monkeypatch.setattr(tasks, "TRANSCODE_MODE", "serial")
+    monkeypatch.setattr(tasks, "probe", lambda src: {**SOURCE_1080P, "video_codec": "hevc"})
+    monkeypatch.setattr(tasks, "run", recording_run(calls))
+
+    tasks.create_variants(uploaded_video.id)
+
+    assert len(calls) == len(tasks.RENDITIONS)
+    assert all("-filter_complex" not in cmd for cmd in calls)
+
+
+def test_ladder_cmd_shares_audio_between_outputs(tmp_path):
+    from videos.tasks import ladder_cmd
+
+    cmd = ladder_cmd(
+        tmp_path / "in.mp4",
+        [(tmp_path / "a.mp4", 720, "3000k"), (tmp_path / "b.mp4", 360, "800k")],
+    )
+
+    assert cmd.count("-c:a") == 1
+    assert "select=\\'v:0,a\\'" in cmd[-1] and "select=\\'v:1,a\\'" in cmd[-1]
+
+
+def ffmpeg_binary():
+    """Path of a real ffmpeg (system or imageio-ffmpeg), else ``None``."""
+    import shutil
+
+    try:
+        import imageio_ffmpeg
+        return shutil.which("ffmpeg") or imageio_ffmpeg.get_ffmpeg_exe()
+    except (ImportError, RuntimeError):
+        return shutil.which("ffmpeg")
+
+
+@pytest.mark.skipif(ffmpeg_binary() is None, reason="ffmpeg not installed")
+def test_ladder_cmd_runs_with_real_ffmpeg(tmp_path, monkeypatch):
+    import subprocess
+    from videos import tasks
+
+    ffmpeg = ffmpeg_binary()
+    monkeypatch.setattr(tasks, "FFMPEG", ffmpeg)
+    src = tmp_path / "in.mp4"
+    subprocess.run([
+        ffmpeg, "-y", "-v", "error",
+        "-f", "lavfi", "-i", "testsrc=size=640x360:rate=25:duration=1",
+        "-f", "lavfi", "-i", "sine=duration=1",
+        "-c:v", "libx264", "-c:a", "aac", "-shortest", str(src),
+    ], check=True)
+    outputs = [(tmp_path / "a.mp4", 360, "800k"), (tmp_path / "b.mp4", 240, "400k")]
+
+    subprocess.run(tasks.ladder_cmd(src, outputs, 25.0), check=True, capture_output=True)
+
+    assert all(dst.stat().st_size > 0 for dst, _, _ in outputs)
+
+
+def test_playlist_bandwidth_uses_segment_sizes(tmp_path):
+    from videos.tasks import playlist_bandwidth
+
+    (tmp_path / "seg_00000.m4s").write_bytes(b"x" * 1000)
+    (tmp_path / "seg_00001.m4s").write_bytes(b"x" * 500)
+    playlist = tmp_path / "index.m3u8"
+    playlist.write_text(
+        "#EXTM3U\n#EXT-X-MAP:URI=\"init.mp4\"\n"
+        "#EXTINF:2.000000,\nseg_00000.m4s\n"
+        "#EXTINF:2.000000,\nseg_00001.m4s\n#EXT-X-ENDLIST\n"
+    )
+
+    assert playlist_bandwidth(playlist) == (4000, 3000)
+
+
+@pytest.mark.django_db
+def test_package_hls_writes_master_playlist(uploaded_video, monkeypatch, tmp_path):
+    from videos import tasks
+
+    uploaded_video.source_variants = [
+        {"path": "videos/1/clip_360p.mp4", "height": 360},
+        {"path": "videos/1/clip_720p.mp4", "height": 720},
+    ]
+    uploaded_video.save()
+
+    calls = []
+
+    def fake_run(cmd, **kwargs):
+        calls.append(cmd)
+        for arg in cmd:
+            if arg.endswith("index.m3u8"):
+                Path(arg).write_text("#EXTM3U\n#EXTINF:6.0,\nseg_00000.m4s\n")
+                (Path(arg).parent / "seg_00000.m4s").write_bytes(b"x" * 600)
+
+    monkeypatch.setattr(tasks, "run", fake_run)
+    monkeypatch.setattr(tasks, "stream_codecs", lambda p: (1280, 720, "avc1.64001f,mp4a.40.2"))
+
+    tasks.package_hls(uploaded_video.id)
+
+    assert len(calls) == 1 and calls[0].count("hls") == 2
+    uploaded_video.refresh_from_db()
+    assert uploaded_video.hls_playlist == f"videos/{uploaded_video.id}/hls/master.m3u8"
+
+    master = (tmp_path / uploaded_video.hls_playlist).read_text().splitlines()
+    assert master[0] == "#EXTM3U"
+    assert 'BANDWIDTH=800,AVERAGE-BANDWIDTH=800,RESOLUTION=1280x720' in master[3]
+    assert master[4::2] == ["720p/index.m3u8", "360p/index.m3u8"]
+
+
+def test_build_ladder_never_upscales_and_caps_bitrate():
+    from videos.tasks import build_ladder
+
+    ladder = build_ladder({"height": 480, "bit_rate": 1_500_000})
+    assert ladder == [("360p", 360, "800k"), ("240p", 240, "400k")]
+
+    ladder = build_ladder({"height": 720, "bit_rate": 1_000_000})
+    assert ladder[0] == ("720p", 720, "1000k")
+
+    assert build_ladder({"height": 180, "bit_rate": 0}) == [("180p", 180, "400k")]
+
+
+@pytest.mark.django_db
+def test_create_variants_skips_heights_above_source(uploaded_video, monkeypatch):
+    from videos import tasks
+
+    calls = []
+    monkeypatch.setattr(tasks, "probe", lambda src: {**SOURCE_1080P, "height": 480})
+    monkeypatch.setattr(tasks, "run", recording_run(calls))
+
+    tasks.create_variants(uploaded_video.id)
+
+    uploaded_video.refresh_from_db()
+    assert [v["height"] for v in uploaded_video.source_variants] == [360, 240]
+    assert uploaded_video.source_variants[0]["top"] is True
+    assert uploaded_video.variants_ready is True
+
+
+def test_remux_height_requires_compliant_source():
+    from videos.tasks import RENDITIONS, remux_height
+
+    assert remux_height(SOURCE_1080P, RENDITIONS) == 1080
+    assert remux_height({**SOURCE_1080P, "video_codec": "hevc"}, RENDITIONS) is None
+    assert remux_height({**SOURCE_1080P, "audio_codec": "opus"}, RENDITIONS) is None
+    assert remux_height({**SOURCE_1080P, "format_name": "matroska,webm"}, RENDITIONS) is None
+    assert remux_height({**SOURCE_1080P, "height": 1000}, RENDITIONS) is None
+    assert remux_height({**SOURCE_1080P, "bit_rate": 20_000_000}, RENDITIONS) is None
+    assert remux_height({**SOURCE_1080P, "keyframe_interval": 10.0}, RENDITIONS) is None
+    assert remux_height({**SOURCE_1080P, "keyframe_interval": None}, RENDITIONS) is None
+
+
+@pytest.mark.django_db
+def test_create_variants_remuxes_compliant_rung(uploaded_video, monkeypatch):
+    from videos import tasks
+
+    calls = []
+    monkeypatch.setattr(tasks, "TRANSCODE_MODE", "single")
+    monkeypatch.setattr(tasks, "run", recording_run(calls))
+
+    tasks.create_variants(uploaded_video.id)
+
+    remux, encode = calls
+    assert remux[remux.index("-c") + 1] == "copy"
+    assert remux[-1].endswith("clip_1080p.part.mp4")
+    assert "split=3" in encode[encode.index("-filter_complex") + 1]
+    assert "1080p" not in encode[-1]
+
+
+@pytest.mark.django_db
+def test_create_variants_fanout_enqueues_rendition_jobs_and_barrier(uploaded_video, monkeypatch):
+    from videos import tasks
+
+    queued = []
+
+    def fake_enqueue(func, *args, **kwargs):
+        queued.append((func, args, kwargs))
+        return f"job-{len(queued)}"
+
+    monkeypatch.setattr(tasks, "TRANSCODE_MODE", "fanout")
+    fake_queues(monkeypatch, fake_enqueue)
+    monkeypatch.setattr(tasks, "run", lambda cmd: pytest.fail("no inline encode"))
+
+    tasks.create_variants(uploaded_video.id)
+
+    *renditions, barrier = queued
+    assert [args[1] for _, args, _ in renditions] == ["1080p", "720p", "360p", "240p"]
+    assert [args[5] for _, args, _ in renditions] == [True, False, False, False]
+    assert barrier[0] is tasks.finalize_variants
+    assert barrier[2]["depends_on"] == ["job-1", "job-2", "job-3", "job-4"]
+    assert renditions[0][2]["job_id"] == f"video-{uploaded_video.id}-encode-1080p"
+    assert barrier[2]["job_id"] == f"video-{uploaded_video.id}-finalize_variants"
+
+
+@pytest.mark.django_db
+def test_rendition_jobs_keep_failure_of_sibling(uploaded_video, monkeypatch):
+    from videos import tasks
+
+    monkeypatch.setattr(tasks, "run", recording_run([]))
+    (Path(uploaded_video.video_file.path).parents[1] / str(uploaded_video.id)).mkdir()
+    Video.objects.filter(pk=uploaded_video.id).update(
+        processing_status=Video.Status.FAILED,
+        processing_error="CalledProcessError: 720p",
+        processing_attempts={"encode": 2},
+    )
+
+    tasks.encode_rendition(uploaded_video.id, "360p", 360, "800k", 25.0, False, 60.0)
+
+    uploaded_video.refresh_from_db()
+    assert uploaded_video.processing_status == Video.Status.FAILED
+    assert uploaded_video.processing_error == "CalledProcessError: 720p"
+    assert uploaded_video.processing_attempts == {"encode": 3}
+
+
+@pytest.mark.django_db
+def test_finalize_variants_requires_every_rendition(uploaded_video, tmp_path):
+    from videos import tasks
+
+    ladder = [("720p", 720, "3000k"), ("360p", 360, "800k")]
+    out_dir = tmp_path / "videos" / str(uploaded_video.id)
+    out_dir.mkdir(parents=True)
+    (out_dir / "clip_720p.mp4").write_bytes(b"\x00")
+
+    with pytest.raises(RuntimeError):
+        tasks.finalize_variants(uploaded_video.id, ladder)
+
+    (out_dir / "clip_360p.mp4").write_bytes(b"\x00")
+    tasks.finalize_variants(uploaded_video.id, ladder)
+
+    uploaded_video.refresh_from_db()
+    assert uploaded_video.variants_ready is True
+    assert uploaded_video.processing_status == Video.Status.ENCODING
+    assert uploaded_video.processing_error == ""
+
+
+def test_chunk_count_depends_on_duration_and_workers():
+    from videos.tasks import CHUNK_MIN_SECONDS, chunk_count
+
+    assert chunk_count(CHUNK_MIN_SECONDS - 1, workers=8) == 1
+    assert chunk_count(CHUNK_MIN_SECONDS * 3, workers=8) == 3
+    assert chunk_count(CHUNK_MIN_SECONDS * 100, workers=4) == 4
+
+
+def test_encode_chunked_splits_encodes_and_concats(tmp_path, monkeypatch):
+    from videos import tasks
+
+    work_dir = tmp_path / "chunks"
+    calls = []
+
+    def fake_run(cmd, **kwargs):
+        calls.append(cmd)
+        if "segment" in cmd:
+            for i in range(3):
+                (work_dir / f"src_{i:04d}.mp4").write_bytes(b"\x00")
+
+    monkeypatch.setattr(tasks, "run", fake_run)
+    outputs = [(tmp_path / "a_720p.mp4", 720, "3000k"), (tmp_path / "a_360p.mp4", 360, "800k")]
+
+    tasks.encode_chunked(tmp_path / "a.mp4", outputs, 25.0, 600.0, 3, work_dir)
+
+    split, *encodes = calls[:4]
+    concats = calls[4:]
+    assert split[split.index("-segment_time") + 1] == "200"
+    assert len(encodes) == 3 and all("tee" in cmd for cmd in encodes)
+    assert [cmd[-1] for cmd in concats] == [str(dst) for dst, _, _ in outputs]
+    assert all(cmd[cmd.index("-c:v") + 1] == "copy" for cmd in concats)
+    assert not work_dir.exists()
+
+
+def test_run_streams_progress_and_keeps_stderr_tail(tmp_path, monkeypatch):
+    import subprocess
+    from videos import tasks
+
+    fake = tmp_path / "ffmpeg"
+    fake.write_text(
+        "#!/bin/sh\n"
+        "for i in $(seq 1 100); do echo noise $i >&2; done\n"
+        "printf 'fps=50.0\\nout_time_us=5000000\\nspeed=2.0x\\nprogress=continue\\n'\n"
+        "printf 'fps=50.0\\nout_time_us=10000000\\nspeed=2.0x\\nprogress=end\\n'\n"
+        "exit ${FAIL:-0}\n"
+    )
+    fake.chmod(0o755)
+    monkeypatch.setattr(tasks, "FFMPEG", str(fake))
+    monkeypatch.setattr(tasks, "is_cancelled", lambda video_id: False)
+
+    published = []
+    monkeypatch.setattr(tasks.progress, "publish", lambda *a: published.append(a))
+
+    tasks.run([str(fake), "-i", "in.mp4"], video_id=7, stage="720p", duration=20.0)
+
+    assert published == [
+        (7, "720p", {"percent": 25.0, "fps": 50.0, "speed": 2.0, "eta": 8}),
+        (7, "720p", {"percent": 100.0, "fps": 50.0, "speed": 2.0, "eta": 0}),
+    ]
+
+    monkeypatch.setenv("FAIL", "3")
+    with pytest.raises(subprocess.CalledProcessError) as exc:
+        tasks.run([str(fake), "-i", "in.mp4"])
+    lines = exc.value.stderr.splitlines()
+    assert len(lines) == tasks.STDERR_TAIL_LINES and lines[-1] == "noise 100"
+
+
+def test_progress_snapshot_handles_missing_values():
+    from videos.tasks import progress_snapshot
+
+    snap = progress_snapshot({"out_time_us": "N/A", "fps": "0.00", "speed": "N/A"}, 60.0)
+    assert snap == {"percent": 0.0, "fps": 0.0, "speed": 0.0, "eta": 0}
+
+
+def test_probe_reads_streams_and_keyframe_interval(monkeypatch):
+    import json
+    from videos import tasks
+
+    payload = {
+        "format": {"format_name": "mov,mp4", "duration": "90.5", "bit_rate": "4000000"},
+        "streams": [
+            {"index": 0, "codec_type": "video", "codec_name": "h264", "width": 1280,
+             "height": 720, "avg_frame_rate": "30000/1001", "pix_fmt": "yuv420p"},
+            {"index": 1, "codec_type": "audio", "codec_name": "aac", "channels": 2,
+             "channel_layout": "stereo", "sample_rate": "48000"},
+        ],
+        "packets": [
+            {"stream_index": 0, "pts_time": "0.000000", "flags": "K__"},
+            {"stream_index": 1, "pts_time": "0.500000", "flags": "K__"},
+            {"stream_index": 0, "pts_time": "1.000000", "flags": "___"},
+            {"stream_index": 0, "pts_time": "2.000000", "flags": "K__"},
+            {"stream_index": 0, "pts_time": "4.000000", "flags": "K__"},
+        ],
+    }
+    monkeypatch.setattr(tasks.subprocess, "check_output", lambda cmd: json.dumps(payload))
+
+    meta = tasks.probe(Path("in.mp4"))
+
+    assert meta["height"] == 720 and meta["fps"] == 29.97
+    assert meta["bit_rate"] == 4_000_000
+    assert meta["keyframe_interval"] == 2.0
+    assert meta["audio_layout"] == "stereo" and meta["audio_sample_rate"] == 48000
+    assert meta["duration"] == 90.5
+
+
+@pytest.mark.django_db
+def test_probe_source_persists_metadata_once(uploaded_video, monkeypatch):
+    from videos import tasks
+
+    probes, queued = [], []
+    monkeypatch.setattr(tasks, "probe", lambda src: probes.append(src) or dict(SOURCE_1080P))
+    fake_queues(monkeypatch, lambda func, *a, **kw: queued.append(func))
+
+    tasks.probe_source(uploaded_video.id)
+    uploaded_video.refresh_from_db()
+    assert uploaded_video.media_info["height"] == 1080
+    assert uploaded_video.duration == 60
+    assert queued == [tasks.create_variants]
+
+    monkeypatch.setattr(tasks, "run", recording_run([]))
+    tasks.create_variants(uploaded_video.id)
+    assert len(probes) == 1
+
+
+@pytest.mark.django_db
+def test_extract_thumb_seeks_input_once_for_all_stills(uploaded_video, monkeypatch, tmp_path):
+    from videos import tasks
+
+    calls = []
+    uploaded_video.media_info = dict(SOURCE_1080P)
+    uploaded_video.save()
+    monkeypatch.setattr(tasks, "THUMB_EXTRA_FORMATS", ("webp",))
+    monkeypatch.setattr(tasks, "probe", lambda src: pytest.fail("must use media_info"))
+    monkeypatch.setattr(tasks, "run", recording_run(calls))
+
+    tasks.extract_thumb(uploaded_video.id, str(tmp_path / "clip_720p.mp4"))
+
+    (cmd,) = calls
+    assert cmd.index("-ss") < cmd.index("-i")
+    assert "split=4" in cmd[cmd.index("-filter_complex") + 1]
+    after_graph = cmd[cmd.index("-filter_complex"):]
+    outputs = [Path(arg).name for arg in after_graph if arg.startswith(str(tmp_path))]
+    assert outputs == ["hero.part.jpg", "thumb.part.png", "hero.part.webp", "thumb.part.webp"]
+    assert (tmp_path / "hero" / str(uploaded_video.id) / "hero.webp").exists()
+
+    uploaded_video.refresh_from_db()
+    assert uploaded_video.thumb.name == f"thumbs/{uploaded_video.id}/thumb.png"
+    assert uploaded_video.duration == 60
+
+
+def test_trickplay_vtt_maps_intervals_to_tiles():
+    from videos.tasks import trickplay_vtt
+
+    vtt = trickplay_vtt(1005.0, (160, 90), "sprite_%03d.jpg").split("\n")
+
+    assert vtt[0] == "WEBVTT"
+    assert vtt[2:4] == ["00:00:00.000 --> 00:00:10.000", "sprite_001.jpg#xywh=0,0,160,90"]
+    assert vtt[5:7] == ["00:00:10.000 --> 00:00:20.000", "sprite_001.jpg#xywh=160,0,160,90"]
+    # cue 100 starts the second sheet, the last cue ends at the duration
+    assert vtt[2 + 100 * 3:4 + 100 * 3] == [
+        "00:16:40.000 --> 00:16:45.000", "sprite_002.jpg#xywh=0,0,160,90",
+    ]
+
+
+@pytest.mark.django_db
+def test_build_trickplay_single_pass_from_smallest_rendition(uploaded_video, monkeypatch, tmp_path):
+    from videos import tasks
+
+    calls = []
+    uploaded_video.media_info = {**SOURCE_1080P, "keyframe_interval": 2.0}
+    uploaded_video.source_variants = [
+        {"path": "videos/1/clip_720p.mp4", "height": 720},
+        {"path": "videos/1/clip_240p.mp4", "height": 240},
+    ]
+    uploaded_video.save()
+    monkeypatch.setattr(tasks, "run", calls.append)
+
+    tasks.build_trickplay(uploaded_video.id)
+
+    (cmd,) = calls
+    assert cmd[cmd.index("-i") + 1].endswith("clip_240p.mp4")
+    assert cmd[cmd.index("-skip_frame") + 1] == "nokey"
+    assert cmd[cmd.index("-vf") + 1] == "fps=1/10,scale=160:90,tile=10x10"
+    assert cmd[cmd.index("-q:v") + 1] == "5"
+
+    monkeypatch.setattr(tasks, "TRICKPLAY_FORMAT", "webp")
+    tasks.build_trickplay(uploaded_video.id)
+    assert calls[-1][calls[-1].index("-quality") + 1] == "75"
+    assert "-q:v" not in calls[-1]
+    assert calls[-1][-1].endswith("sprite_%03d.webp")
+
+    uploaded_video.refresh_from_db()
+    vtt = tmp_path / uploaded_video.trickplay_vtt
+    assert vtt.read_text().count("-->") == 6
+
+
+@pytest.mark.django_db
+def test_pipeline_stage_tracks_attempts_status_and_errors(uploaded_video, monkeypatch):
+    from videos import tasks
+
+    monkeypatch.setattr(tasks, "run", recording_run([]))
+    uploaded_video.source_variants = [{"path": "videos/1/clip_360p.mp4", "height": 360}]
+    uploaded_video.save()
+
+    def broken_disk(playlist):
+        raise OSError("disk")
+
+    monkeypatch.setattr(tasks, "playlist_bandwidth", broken_disk)
+    with pytest.raises(OSError):
+        tasks.package_hls(uploaded_video.id)
+
+    uploaded_video.refresh_from_db()
+    assert uploaded_video.processing_status == Video.Status.FAILED
+    assert uploaded_video.processing_stage == "package"
+    assert uploaded_video.processing_error == "OSError: disk"
+    assert uploaded_video.processing_attempts == {"package": 1}
+
+    monkeypatch.setattr(tasks, "playlist_bandwidth", lambda p: (800, 800))
+    monkeypatch.setattr(tasks, "stream_codecs", lambda p: (640, 360, "avc1.64001e"))
+    tasks.package_hls(uploaded_video.id)
+
+    uploaded_video.refresh_from_db()
+    assert uploaded_video.processing_status == Video.Status.PACKAGED
+    assert uploaded_video.processing_error == ""
+    assert uploaded_video.processing_attempts == {"package": 2}
+
+
+@pytest.mark.django_db
+def test_pipeline_stage_records_done_before_enqueueing_successor(uploaded_video, monkeypatch, tmp_path):
+    from videos import tasks
+
+    seen = []
+
+    def enqueue(func, video_id, **kwargs):
+        seen.append((func, Video.objects.get(pk=video_id).processing_status))
+
+    fake_queues(monkeypatch, enqueue)
+    monkeypatch.setattr(tasks, "run", recording_run([]))
+    Video.objects.filter(pk=uploaded_video.id).update(
+        processing_status=Video.Status.PACKAGED, media_info=SOURCE_1080P,
+    )
+
+    assert tasks.extract_thumb(uploaded_video.id, str(tmp_path / "clip_720p.mp4")) is None
+
+    assert seen == [(tasks.build_trickplay, Video.Status.THUMBNAILED)]
+
+
+@pytest.mark.django_db
+def test_create_variants_ignores_truncated_part_files(uploaded_video, monkeypatch, tmp_path):
+    from videos import tasks
+
+    calls = []
+    monkeypatch.setattr(tasks, "probe", lambda src: {**SOURCE_1080P, "height": 360})
+    monkeypatch.setattr(tasks, "run", recording_run(calls))
+    out_dir = tmp_path / "videos" / str(uploaded_video.id)
+    out_dir.mkdir(parents=True)
+    (out_dir / "clip_360p.part.mp4").write_bytes(b"trunc")
+
+    tasks.create_variants(uploaded_video.id)
+
+    assert len(calls) == 1
+    assert (out_dir / "clip_360p.mp4").exists()
+    assert not (out_dir / "clip_360p.part.mp4").exists()
+
+
+@pytest.mark.django_db
+def test_resume_pipeline_restarts_from_failed_or_next_stage(uploaded_video, monkeypatch):
+    from videos import tasks
+
+    queued = []
+    fake_queues(monkeypatch, lambda func, *a, **kw: queued.append((func, kw)))
+
+    Video.objects.filter(pk=uploaded_video.id).update(
+        processing_status=Video.Status.FAILED, processing_stage="package",
+    )
+    assert tasks.resume_pipeline(uploaded_video.id) == "package"
+
+    Video.objects.filter(pk=uploaded_video.id).update(processing_status=Video.Status.PROBED)
+    assert tasks.resume_pipeline(uploaded_video.id) == "encode"
+
+    Video.objects.filter(pk=uploaded_video.id).update(processing_status=Video.Status.READY)
+    assert tasks.resume_pipeline(uploaded_video.id) is None
+
+    assert [func for func, _ in queued] == [tasks.package_hls, tasks.create_variants]
+    assert all(kw["retry"] is tasks.STAGE_RETRY for _, kw in queued)
+
+
+@pytest.mark.django_db
+def test_enqueue_stage_skips_job_already_in_flight(uploaded_video, monkeypatch):
+    from videos import tasks
+
+    queued = []
+    running = object()
+    fake_queues(monkeypatch, lambda func, *a, **kw: queued.append(kw["job_id"]))
+    monkeypatch.setattr(
+        tasks, "active_job",
+        lambda job_id: running if job_id.endswith("-probe_source") else None,
+    )
+
+    assert tasks.enqueue_stage(tasks.probe_source, 7) is running
+    tasks.enqueue_stage(tasks.extract_thumb, 7)
+
+    assert queued == ["video-7-extract_thumb"]
+
+
+@pytest.mark.django_db
+def test_create_variants_skips_when_rendition_locked(uploaded_video, monkeypatch):
+    from videos import tasks
+
+    held = {f"videoflix:lock:{uploaded_video.id}:720p"}
+    monkeypatch.setattr(tasks, "TRANSCODE_MODE", "serial")
+    monkeypatch.setattr(tasks, "get_connection", lambda: FakeLockRedis(held))
+    monkeypatch.setattr(tasks, "run", lambda cmd, **kw: pytest.fail("locked"))
+
+    tasks.create_variants(uploaded_video.id)
+
+    assert held == {f"videoflix:lock:{uploaded_video.id}:720p"}
+    uploaded_video.refresh_from_db()
+    assert uploaded_video.source_variants in (None, [])
+
+
+def test_run_terminates_ffmpeg_once_video_is_cancelled(tmp_path, monkeypatch):
+    from videos import tasks
+
+    fake = tmp_path / "ffmpeg"
+    fake.write_text("#!/bin/sh\nprintf 'progress=continue\\n'\nexec sleep 30\n")
+    fake.chmod(0o755)
+    monkeypatch.setattr(tasks, "FFMPEG", str(fake))
+    monkeypatch.setattr(tasks, "is_cancelled", lambda video_id: True)
+    monkeypatch.setattr(tasks.progress, "publish", lambda *a: pytest.fail("cancelled"))
+
+    with pytest.raises(tasks.PipelineCancelled):
+        tasks.run([str(fake)], video_id=7, stage="720p")
+
+
+@pytest.mark.django_db
+def test_cancel_pipeline_cancels_waiting_jobs_and_stops_stages(uploaded_video, monkeypatch, tmp_path):
+    from videos import tasks
+
+    class FakeJob:
+        def __init__(self, status):
+            self.status, self.cancelled = status, False
+
+        def get_status(self, refresh=True):
+            return self.status
+
+        def cancel(self):
+            self.cancelled = True
+
+    jobs = {"video-99-encode-720p": FakeJob("queued"), "video-99-encode-360p": FakeJob("started")}
+    redis = tasks.get_connection()
+    for job_id in jobs:
+        redis.sadd(tasks.jobs_key(99), job_id)
+
+    def fetch(job_id, connection):
+        if job_id not in jobs:
+            raise tasks.NoSuchJobError(job_id)
+        return jobs[job_id]
+
+    monkeypatch.setattr(tasks.Job, "fetch", fetch)
+    monkeypatch.setattr(tasks.progress, "clear", lambda video_id: None)
+
+    assert tasks.cancel_pipeline(99) == 1
+    assert jobs["video-99-encode-720p"].cancelled
+    assert not jobs["video-99-encode-360p"].cancelled
+    assert tasks.is_cancelled(99)
+    assert tasks.enqueue_stage(tasks.extract_thumb, 99) is None
+
+    part = tmp_path / "videos" / str(uploaded_video.id) / "clip_720p.part.mp4"
+    part.parent.mkdir(parents=True)
+    part.touch()
+
+    def cancelled_run(cmd, **kwargs):
+        raise tasks.PipelineCancelled("gelöscht")
+
+    monkeypatch.setattr(tasks, "run", cancelled_run)
+    tasks.create_variants(uploaded_video.id)
+
+    assert not part.parent.exists()
+    uploaded_video.refresh_from_db()
+    assert uploaded_video.processing_status != Video.Status.FAILED
+
+    Video.objects.filter(pk=uploaded_video.id).delete()
+    assert tasks.create_variants(uploaded_video.id) is None
+
+
+@pytest.mark.django_db
+def test_queue_for_routes_encodes_by_trailer_flag_and_duration(uploaded_video):
+    from videos import tasks
+
+    assert tasks.queue_for(tasks.extract_thumb, uploaded_video.id) == "fast"
+    assert tasks.queue_for(tasks.create_variants, uploaded_video.id) == "feature"
+
+    Video.objects.filter(pk=uploaded_video.id).update(duration=90)
+    assert tasks.queue_for(tasks.encode_rendition, uploaded_video.id) == "trailer"
+
+    Video.objects.filter(pk=uploaded_video.id).update(duration=5400, is_trailer=True)
+    assert tasks.queue_for(tasks.create_variants, uploaded_video.id) == "trailer"
+
+
+def test_encode_timeout_scales_with_duration_and_resolution(monkeypatch):
+    from videos import tasks
+
+    monkeypatch.setattr(tasks.estimates, "speed", lambda slowest=False: 50.0)
+    ladder = tasks.build_ladder(SOURCE_1080P)
+
+    clip = tasks.encode_work(SOURCE_1080P, ladder)
+    film = tasks.encode_work({**SOURCE_1080P, "duration": 5400.0}, ladder)
+    small = tasks.encode_work({**SOURCE_1080P, "width": 640, "height": 360}, ladder[-2:])
+
+    assert film == pytest.approx(clip * 90)
+    assert small < clip
+    assert tasks.encode_work(SOURCE_1080P, ladder, copy_height=1080) < clip
+    assert tasks.encode_timeout(clip) == tasks.MIN_JOB_TIMEOUT
+    assert tasks.encode_timeout(film) == round(film / 50.0 * tasks.TIMEOUT_FACTOR)
+    assert tasks.encode_timeout(film * 100) == tasks.MAX_JOB_TIMEOUT
+
+
+def test_remux_timeout_scales_with_source_size(monkeypatch):
+    from videos import tasks
+
+    monkeypatch.setattr(tasks.estimates, "speed", lambda slowest=False: 50.0)
+    monkeypatch.setattr(tasks, "REMUX_MB_PER_SECOND", 10.0)
+    film = {**SOURCE_1080P, "duration": 7200.0}  # 6 Mbit/s → 5.4 GB
+    copy_rung = [("1080p", 1080, "5000k")]
+
+    assert tasks.remux_seconds(film) == pytest.approx(7200 * 6_000_000 / 8 / 10 / 1024**2)
+    assert tasks.encode_job_kwargs(SOURCE_1080P, copy_rung)["job_timeout"] == tasks.MIN_JOB_TIMEOUT
+    kwargs = tasks.encode_job_kwargs(film, copy_rung)
+    assert kwargs["job_timeout"] == int(tasks.remux_seconds(film) * tasks.TIMEOUT_FACTOR)
+    assert kwargs["meta"]["estimate"] == round(tasks.remux_seconds(film))
+    assert tasks.copy_seconds(film, [("720p", 720, "3000k")], 1080) == 0.0
+
+
+@pytest.mark.django_db
+def test_probe_source_sizes_encode_timeout_and_queue_eta(uploaded_video, monkeypatch):
+    from videos import tasks
+
+    queued = []
+    fake_queues(monkeypatch, lambda func, *a, **kw: queued.append(kw))
+    monkeypatch.setattr(tasks.estimates, "speed", lambda slowest=False: 1.0)
+
+    tasks.probe_source(uploaded_video.id)
+
+    assert queued[0]["job_timeout"] > tasks.MIN_JOB_TIMEOUT
+    assert queued[0]["meta"]["estimate"] > 0
+
+    job_id = tasks.stage_job_id(uploaded_video.id, "create_variants")
+    jobs = {
+        "other": SimpleNamespace(meta={"estimate": 600}),
+        job_id: SimpleNamespace(meta={"estimate": 300}),
+    }
+    queue = SimpleNamespace(
+        name="feature", connection=None, get_job_ids=lambda: ["other", job_id],
+    )
+    monkeypatch.setattr(tasks, "get_queue", lambda name: queue)
+    monkeypatch.setattr(tasks.Job, "fetch_many", lambda ids, connection: [jobs[i] for i in ids])
+    monkeypatch.setattr(tasks.Worker, "count", lambda queue: 2)
+
+    assert tasks.queue_eta(uploaded_video.id) == {"queue": "feature", "ahead": 1, "seconds": 600}
+
+
+@pytest.mark.django_db
+def test_probe_source_reuses_outputs_of_identical_upload(uploaded_video, monkeypatch, tmp_path):
+    from videos import tasks
+    from videos.hashing import file_digest
+
+    queued = []
+    fake_queues(monkeypatch, lambda func, *a, **kw: queued.append(func))
+    monkeypatch.setattr(tasks, "probe", lambda src: pytest.fail("no probe for duplicates"))
+    original_hash = file_digest(uploaded_video.video_file)
+    Video.objects.filter(pk=uploaded_video.id).update(
+        content_hash=original_hash,
+        processing_status=Video.Status.READY,
+        media_info=SOURCE_1080P,
+        source_url=f"videos/{uploaded_video.id}/clip_720p.mp4",
+        hls_playlist=f"videos/{uploaded_video.id}/hls/master.m3u8",
+        thumb=f"thumbs/{uploaded_video.id}/thumb.png",
+    )
+    (tmp_path / "videos" / "tmp" / "copy.mp4").write_bytes(b"\x00")
+    copy = Video.objects.create(title="Copy", video_file="videos/tmp/copy.mp4")
+    assert copy.content_hash == ""  # stored paths are hashed by the worker
+
+    tasks.probe_source(copy.id)
+
+    copy.refresh_from_db()
+    assert copy.content_hash == original_hash
+    assert queued == []  # no create_variants
+    assert copy.processing_status == Video.Status.READY
+    assert copy.source_url == f"videos/{uploaded_video.id}/clip_720p.mp4"
+    assert copy.thumb.name == f"thumbs/{uploaded_video.id}/thumb.png"
+    assert copy.media_info == SOURCE_1080P
+
+
+@pytest.mark.django_db
+def test_duplicate_waits_for_twin_in_flight_then_adopts(uploaded_video, monkeypatch, tmp_path):
+    from videos import tasks
+
+    tasks.probe_source(uploaded_video.id)  # hashes the original, encode queued
+    uploaded_video.refresh_from_db()
+    (tmp_path / "videos" / "tmp" / "copy.mp4").write_bytes(b"\x00")
+    copy = Video.objects.create(title="Copy", video_file="videos/tmp/copy.mp4")
+
+    tasks.probe_source(copy.id)
+    copy.refresh_from_db()
+    assert copy.processing_stage == tasks.DEDUPE_STAGE
+    assert copy.processing_status == Video.Status.PROBED
+
+    uploaded_video.source_url = "videos/1/clip_720p.mp4"
+    uploaded_video.trickplay_vtt = "videos/1/trickplay/thumbs.vtt"
+    assert tasks.share_with_twins(uploaded_video) == 1
+    copy.refresh_from_db()
+    assert copy.processing_status == Video.Status.READY
+    assert copy.trickplay_vtt == "videos/1/trickplay/thumbs.vtt"
+
+
+@pytest.mark.django_db
+def test_copies_probed_together_never_wait_on_each_other(uploaded_video):
+    from videos import tasks
+
+    Video.objects.filter(pk=uploaded_video.id).update(
+        content_hash="abc", processing_stage="probe",
+    )
+    copy = Video.objects.create(title="Copy", video_file="videos/tmp/clip.mp4")
+    Video.objects.filter(pk=copy.id).update(content_hash="abc", processing_stage="probe")
+    uploaded_video.refresh_from_db()
+    copy.refresh_from_db()
+
+    assert tasks.find_twin(uploaded_video) is None
+    assert tasks.find_twin(copy) == uploaded_video
+
+
+@pytest.mark.django_db
+def test_failed_twin_wakes_waiting_duplicates(uploaded_video, monkeypatch):
+    from videos import tasks
+
+    queued = []
+    fake_queues(monkeypatch, lambda func, video_id, **kw: queued.append((func, video_id)))
+    Video.objects.filter(pk=uploaded_video.id).update(content_hash="abc")
+    copy = Video.objects.create(title="Copy", video_file="videos/tmp/clip.mp4")
+    Video.objects.filter(pk=copy.id).update(
+        content_hash="abc", processing_stage=tasks.DEDUPE_STAGE,
+    )
+    queued.clear()
+
+    with pytest.raises(RuntimeError):
+        tasks.package_hls(uploaded_video.id)  # no renditions
+
+    assert queued == [(tasks.probe_source, copy.id)]
+
+
+def test_purge_later_batches_deletions_into_one_job(tmp_path, settings, monkeypatch):
+    from videos import tasks
+
+    settings.MEDIA_ROOT = str(tmp_path)
+    redis = FakeLockRedis()
+    monkeypatch.setattr("videos.tasks.get_connection", lambda: redis)
+    enqueued = []
+    fake_queues(monkeypatch, lambda func, *a, **kw: enqueued.append(func))
+    for rel in ("videos/1/a.mp4", "videos/2/hls/master.m3u8", "thumbs/2/t.png"):
+        (tmp_path / rel).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / rel).write_bytes(b"x")
+    outside = tmp_path.parent / "keep.txt"
+    outside.write_text("x")
+
+    tasks.purge_later(["videos/1/a.mp4"])
+    tasks.purge_later(["videos/2", "thumbs/2", "../keep.txt"])
+    assert enqueued == [tasks.purge_media]
+
+    assert tasks.purge_media(batch_size=2) == 3
+    assert not (tmp_path / "videos" / "1" / "a.mp4").exists()
+    assert not (tmp_path / "videos" / "2").exists()
+    assert not (tmp_path / "thumbs" / "2").exists()
+    assert outside.exists()
+
+    tasks.purge_later(["videos/1"])
+    assert enqueued == [tasks.purge_media, tasks.purge_media]
+
+
+@pytest.mark.django_db
+def test_pipeline_streams_source_and_publishes_to_remote_storage(
+    remote_storage, settings, monkeypatch,
+):
+    from videos import tasks
+
+    redis = FakeLockRedis()
+    monkeypatch.setattr("videos.tasks.get_connection", lambda: redis)
+    monkeypatch.setattr("videos.estimates.get_connection", lambda: redis)
+    monkeypatch.setattr("videos.signals.enqueue_stage", lambda *a, **kw: None)
+    fake_queues(monkeypatch, lambda *a, **kw: None)
+    monkeypatch.setattr(tasks, "active_job", lambda job_id: None)
+    monkeypatch.setattr(tasks, "TRANSCODE_MODE", "single")
+    probed, calls = [], []
+    monkeypatch.setattr(tasks, "probe", lambda src: probed.append(src) or dict(SOURCE_1080P))
+    monkeypatch.setattr(tasks, "run", recording_run(calls))
+    remote_storage.save("videos/tmp/clip.mp4", ContentFile(b"\x00"))
+    video = Video.objects.create(
+        title="Clip", video_file="videos/tmp/clip.mp4", content_hash="abc",
+    )
+
+    tasks.create_variants(video.id)
+
+    source = "http://minio:9000/bucket/videos/tmp/clip.mp4"
+    assert probed == [source] and source in calls[0]
+    video.refresh_from_db()
+    assert video.source_url == f"videos/{video.id}/clip_720p.mp4"
+    assert (remote_storage.bucket_dir / video.source_url).exists()
+    assert not list(Path(settings.VIDEO_SCRATCH_ROOT).rglob("*.mp4"))
+
+
+def test_available_cpus_respects_cgroup_quota(tmp_path, monkeypatch):
+    from videos import tasks
+
+    cpu_max = tmp_path / "cpu.max"
+    monkeypatch.setattr(tasks, "CGROUP_CPU_MAX", cpu_max)
+    monkeypatch.setattr(tasks.os, "sched_getaffinity", lambda pid: set(range(64)), raising=False)
+
+    cpu_max.write_text("200000 100000\n")  # docker compose cpus: '2'
+    assert tasks.available_cpus() == 2
+    cpu_max.write_text("150000 100000\n")
+    assert tasks.available_cpus() == 2
+    cpu_max.write_text("max 100000\n")
+    assert tasks.available_cpus() == 64
+    cpu_max.unlink()
+    assert tasks.available_cpus() == 64
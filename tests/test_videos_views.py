@@ -4,10 +4,11 @@ from django.utils.decorators import method_decorator
 from django.views.decorators.cache import cache_page
 from rest_framework import permissions, status, viewsets
 from rest_framework.generics import ListAPIView
-from videos.models import Video, WatchProgress
+from videos.models import ChunkedUpload, Video, WatchProgress
 from videos.serializers import VideoSerializer 
 
 import pytest
+from pathlib import Path
 from django.urls import reverse
 from rest_framework.test import APIClient
 
@@ -173,3 +174,135 @@ def test_endpoints_require_auth(video):
 
 
 
+def test_video_progress_endpoint(api_client, video, monkeypatch):
+    monkeypatch.setattr(
+        "videos.views.progress.read",
+        lambda pk: {"ladder": {"percent": 10.0, "fps": 24.0, "speed": 1.0, "eta": 300}},
+    )
+    resp = api_client.get(reverse("videos-progress", args=[video.id]))
+
+    assert resp.status_code == status.HTTP_200_OK
+    assert resp.json() == {
+        "video": video.id,
+        "stages": {"ladder": {"percent": 10.0, "fps": 24.0, "speed": 1.0, "eta": 300}},
+    }
+
+
+def test_chunked_upload_resumes_and_finalizes(
+    api_client, settings, tmp_path, monkeypatch, django_capture_on_commit_callbacks,
+):
+    settings.MEDIA_ROOT = str(tmp_path)
+    queued = []
+    monkeypatch.setattr("videos.signals.enqueue_stage", lambda func, vid: queued.append(vid))
+    payload = b"0123456789" * 300_000
+
+    resp = api_client.post(
+        reverse("uploads-list"),
+        {"filename": "../master.mp4", "size": len(payload), "title": "Master"},
+        format="json",
+    )
+    assert resp.status_code == status.HTTP_201_CREATED
+    assert resp["Upload-Offset"] == "0"
+    url = reverse("uploads-detail", args=[resp.json()["id"]])
+
+    def patch(offset, body):
+        return api_client.generic(
+            "PATCH", url, body,
+            content_type="application/offset+octet-stream",
+            HTTP_UPLOAD_OFFSET=str(offset),
+        )
+
+    first = patch(0, payload[:2_000_000])
+    assert first.status_code == status.HTTP_204_NO_CONTENT
+    assert first["Upload-Offset"] == "2000000"
+
+    assert patch(0, payload[:10]).status_code == status.HTTP_409_CONFLICT
+    assert api_client.head(url)["Upload-Offset"] == "2000000"
+    assert api_client.post(url + "finalize/").status_code == status.HTTP_409_CONFLICT
+
+    assert patch(2_000_000, payload[2_000_000:]).status_code == status.HTTP_204_NO_CONTENT
+
+    with django_capture_on_commit_callbacks(execute=True):
+        done = api_client.post(url + "finalize/")
+    assert done.status_code == status.HTTP_201_CREATED
+    video = Video.objects.get(pk=done.json()["id"])
+    assert video.video_file.name.endswith("/master.mp4")
+    assert video.video_file.name.startswith("videos/uploads/")
+    assert Path(video.video_file.path).read_bytes() == payload
+    assert queued == [video.id]
+
+    # a concurrent call that loaded the upload before the video was linked
+    stale = ChunkedUpload.objects.get(pk=resp.json()["id"])
+    stale.video = None
+    monkeypatch.setattr("videos.views.ChunkedUploadViewSet.get_object", lambda self: stale)
+    again = api_client.post(url + "finalize/")
+    assert again.json()["id"] == video.id
+    assert Video.objects.count() == 1
+
+
+def test_chunked_upload_rejects_non_video_names(api_client):
+    resp = api_client.post(
+        reverse("uploads-list"),
+        {"filename": "notes.txt", "size": 10, "title": "x"},
+        format="json",
+    )
+    assert resp.status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_create_streams_upload_once_and_rejects_non_video(api_client, settings, tmp_path, monkeypatch):
+    from django.core.files.uploadedfile import SimpleUploadedFile
+
+    from videos.hashing import new_hasher
+
+    settings.MEDIA_ROOT = str(tmp_path)
+    monkeypatch.setattr("videos.signals.enqueue_stage", lambda *a, **kw: None)
+    content = b"\x00\x00\x00\x18ftypmp42" + b"\x01" * 200_000
+
+    resp = api_client.post(
+        reverse("videos-list"),
+        {"title": "Clip", "video_file": SimpleUploadedFile("clip.mp4", content)},
+        format="multipart",
+    )
+    assert resp.status_code == status.HTTP_201_CREATED
+    video = Video.objects.get(pk=resp.json()["id"])
+    assert video.video_file.name.startswith("videos/uploads/")
+    assert Path(video.video_file.path).read_bytes() == content
+    hasher = new_hasher()
+    hasher.update(content)
+    assert video.content_hash == hasher.hexdigest()
+    assert not (tmp_path / "videos" / "tmp").exists()
+
+    bad = api_client.post(
+        reverse("videos-list"),
+        {"title": "Fake", "video_file": SimpleUploadedFile("fake.mp4", b"%PDF-1.7" + b"x" * 100)},
+        format="multipart",
+    )
+    assert bad.status_code == status.HTTP_400_BAD_REQUEST
+    assert len(list((tmp_path / "videos" / "uploads").iterdir())) == 1
+
+
+def test_protected_media_hands_off_to_nginx(api_client, settings, tmp_path, monkeypatch):
+    settings.MEDIA_ROOT = str(tmp_path)
+    segment = tmp_path / "videos" / "4" / "hls" / "720p" / "seg_00001.m4s"
+    segment.parent.mkdir(parents=True)
+    segment.write_bytes(b"\x00" * 10)
+    url = reverse("protected-media", args=["videos/4/hls/720p/seg_00001.m4s"])
+
+    assert APIClient().get(url).status_code == status.HTTP_401_UNAUTHORIZED
+
+    resp = api_client.get(url, HTTP_RANGE="bytes=0-4")
+    assert resp.status_code == status.HTTP_200_OK
+    assert resp["X-Accel-Redirect"] == "/protected-media/videos/4/hls/720p/seg_00001.m4s"
+    assert resp["Content-Type"] == "video/iso.segment"
+    assert "immutable" in resp["Cache-Control"]
+    assert resp["Accept-Ranges"] == "bytes"
+    assert resp.content == b""
+
+    monkeypatch.setattr("videos.views.MEDIA_ACCEL_REDIRECT", False)
+    direct = api_client.get(url, HTTP_RANGE="bytes=0-4")
+    assert direct.status_code == status.HTTP_200_OK
+    assert "Accept-Ranges" not in direct
+    assert b"".join(direct.streaming_content) == b"\x00" * 10
+
+    for bad in ("videos/4/../../secret.txt", "users/1/avatar.png", "videos/4/missing.mp4"):
+        assert api_client.get(reverse("protected-media", args=[bad])).status_code == 404
@@ -117,16 +117,48 @@ CACHES = {
     }
 }
 
+RQ_CONNECTION = {
+    "HOST": os.getenv("REDIS_HOST", "redis"),
+    "PORT": os.getenv("REDIS_PORT", 6379),
+    "DB": os.getenv("REDIS_DB", 0),
+    "REDIS_CLIENT_KWARGS": {},
+}
+
+# Workers list queues in priority order, e.g. "rqworker trailer feature".
+# fast = probe/finalize/HLS/thumbnails, trailer = encodes of trailers and
+# short clips, feature = long encodes, maintenance = cleanup jobs
 RQ_QUEUES = {
-    "default": {
-        "HOST": os.getenv("REDIS_HOST", "redis"),
-        "PORT": os.getenv("REDIS_PORT", 6379),
-        "DB": os.getenv("REDIS_DB", 0),
-        "DEFAULT_TIMEOUT": 900,
-        "REDIS_CLIENT_KWARGS": {},
-    }
+    "default": {**RQ_CONNECTION, "DEFAULT_TIMEOUT": 900},
+    "fast": {**RQ_CONNECTION, "DEFAULT_TIMEOUT": 900},
+    "trailer": {**RQ_CONNECTION, "DEFAULT_TIMEOUT": 3600},
+    "feature": {**RQ_CONNECTION, "DEFAULT_TIMEOUT": 7200},
+    "maintenance": {**RQ_CONNECTION, "DEFAULT_TIMEOUT": 3600},
 }
 
+# === VIDEO PIPELINE ===
+# "single" = one ffmpeg decode for the whole ladder, "serial" = one per rendition,
+# "fanout" = one RQ job per rendition (scale by adding rqworker containers),
+# "chunked" = keyframe-split parallel encode for long sources
+VIDEO_TRANSCODE_MODE = os.getenv("VIDEO_TRANSCODE_MODE", "single")
+# Encodes of trailers and videos up to this length use the "trailer" queue
+VIDEO_TRAILER_MAX_SECONDS = int(os.getenv("VIDEO_TRAILER_MAX_SECONDS", 300))
+# Encode speed (megapixels/s) assumed before any worker has been measured
+VIDEO_DEFAULT_ENCODE_SPEED = float(os.getenv("VIDEO_DEFAULT_ENCODE_SPEED", 20.0))
+# Read throughput (MB/s) assumed for stream copies, e.g. from S3 via HTTP
+VIDEO_REMUX_MB_PER_SECOND = float(os.getenv("VIDEO_REMUX_MB_PER_SECOND", 20.0))
+VIDEO_CHUNK_MIN_SECONDS = int(os.getenv("VIDEO_CHUNK_MIN_SECONDS", 120))
+# 0/unset: one chunk per CPU of the worker's cgroup quota (compose "cpus:")
+VIDEO_CHUNK_WORKERS = int(os.getenv("VIDEO_CHUNK_WORKERS", 0)) or None
+# Extra still formats written next to hero.jpg/thumb.png, e.g. "webp,avif"
+VIDEO_THUMB_EXTRA_FORMATS = [
+    f for f in os.getenv("VIDEO_THUMB_EXTRA_FORMATS", "").split(",") if f
+]
+# Seek previews: one tile every N seconds, "jpg" or "webp" sprite sheets
+VIDEO_TRICKPLAY_INTERVAL = int(os.getenv("VIDEO_TRICKPLAY_INTERVAL", 10))
+VIDEO_TRICKPLAY_FORMAT = os.getenv("VIDEO_TRICKPLAY_FORMAT", "jpg")
+# Largest original accepted by the resumable upload API (/api/uploads/)
+VIDEO_UPLOAD_MAX_BYTES = int(os.getenv("VIDEO_UPLOAD_MAX_BYTES", 20 * 1024**3))
+
 # === PASSWORD VALIDATORS ===
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -222,6 +254,55 @@ STATIC_ROOT = BASE_DIR / "staticfiles"
 
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
+# /api/media/<path> checks auth, then nginx sends the file from the
+# internal location MEDIA_ACCEL_PREFIX (set False to stream via Django in dev)
+MEDIA_ACCEL_REDIRECT = os.getenv("MEDIA_ACCEL_REDIRECT", "True") == "True"
+MEDIA_ACCEL_PREFIX = "/protected-media/"
+# Signed, expiring media URLs checked by nginx secure_link (empty = plain
+# MEDIA_URL links, only allowed with DEBUG – see check videos.E001);
+# must match the nginx config
+MEDIA_SIGNING_SECRET = os.getenv("MEDIA_SIGNING_SECRET", "")
+MEDIA_URL_TTL = int(os.getenv("MEDIA_URL_TTL", 6 * 3600))
+MEDIA_SECURE_PREFIX = "/secure/"
+
+# Originals and pipeline outputs stay in MEDIA_ROOT unless an S3-compatible
+# bucket (AWS, MinIO) is configured; workers then encode into the local
+# VIDEO_SCRATCH_ROOT and upload the results through the storage API
+MEDIA_S3_BUCKET = os.getenv("MEDIA_S3_BUCKET", "")
+VIDEO_SCRATCH_ROOT = Path(os.getenv("VIDEO_SCRATCH_ROOT", BASE_DIR / "scratch"))
+VIDEO_UPLOAD_WORKERS = int(os.getenv("VIDEO_UPLOAD_WORKERS", 8))
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+}
+if MEDIA_S3_BUCKET:
+    from boto3.s3.transfer import TransferConfig
+
+    STORAGES["default"] = {
+        "BACKEND": "storages.backends.s3.S3Storage",
+        "OPTIONS": {
+            "bucket_name": MEDIA_S3_BUCKET,
+            "endpoint_url": os.getenv("MEDIA_S3_ENDPOINT_URL") or None,
+            "access_key": os.getenv("MEDIA_S3_ACCESS_KEY"),
+            "secret_key": os.getenv("MEDIA_S3_SECRET_KEY"),
+            "region_name": os.getenv("MEDIA_S3_REGION") or None,
+            "addressing_style": "path",  # MinIO
+            "file_overwrite": True,
+            "querystring_expire": MEDIA_URL_TTL,
+            # multipart uploads in parallel parts for large renditions
+            "transfer_config": TransferConfig(
+                multipart_threshold=64 * 1024**2,
+                multipart_chunksize=64 * 1024**2,
+                max_concurrency=8,
+            ),
+        },
+    }
+    # hls/ and trickplay/ link their files relatively, so they get plain
+    # URLs and must be public-read in the bucket (ops/minio/public-read.json)
+    STORAGES["public_media"] = {
+        "BACKEND": STORAGES["default"]["BACKEND"],
+        "OPTIONS": {**STORAGES["default"]["OPTIONS"], "querystring_auth": False},
+    }
 
 WHITENOISE_MAX_AGE = 86400
 WHITENOISE_USE_FINDERS = True
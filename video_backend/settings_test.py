@@ -6,3 +6,7 @@ DATABASES = {
         "NAME": ":memory:",
     }
 }
+
+# unsignierte /media/-Links, auch wenn .env ein Secret setzt; Tests mit
+# Signatur setzen es selbst
+MEDIA_SIGNING_SECRET = ""
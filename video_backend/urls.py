@@ -7,7 +7,13 @@ from django.contrib.auth import views as auth_views
 from django.urls import path, re_path, include
 from rest_framework.routers import DefaultRouter
 
-from videos.views import ProgressViewSet, VideoViewSet, TrailerList
+from videos.views import (
+    ChunkedUploadViewSet,
+    ProgressViewSet,
+    ProtectedMediaView,
+    TrailerList,
+    VideoViewSet,
+)
 from users.views import activate
 from video_backend.views import health_check
 
@@ -16,6 +22,7 @@ from video_backend.views import health_check
 router = DefaultRouter()
 router.register(r"progress", ProgressViewSet, basename="progress")
 router.register(r"videos", VideoViewSet, basename="videos")
+router.register(r"uploads", ChunkedUploadViewSet, basename="uploads")
 
 urlpatterns = [
     path("admin/", admin.site.urls),
@@ -35,6 +42,9 @@ urlpatterns = [
     path("activate/<uidb64>/<token>/", activate, name="account-activate"),
     path("api/trailers/", TrailerList.as_view(), name="trailer-list"),
 
+    # Authenticated media, delivered by nginx via X-Accel-Redirect
+    path("api/media/<path:path>", ProtectedMediaView.as_view(), name="protected-media"),
+
     # Django-RQ dashboard
     path("django-rq/", include("django_rq.urls")),
 
@@ -10,8 +10,9 @@ class VideosConfig(AppConfig):
     name = "videos"
 
     def ready(self) -> None:  # noqa: D401
-        """Import translations and signal handlers."""
+        """Import translations, signal handlers and system checks."""
         from . import translation  # noqa: WPS433, F401
         from . import signals  # noqa: WPS433, F401
+        from . import checks  # noqa: WPS433, F401
 
         super().ready()
@@ -0,0 +1,23 @@
+"""System checks for the media delivery setup."""
+
+from __future__ import annotations
+
+from django.conf import settings
+from django.core.checks import Error, register
+
+from . import storage
+
+
+@register()
+def media_signing_secret(app_configs, **kwargs) -> list[Error]:
+    """nginx only serves local media via signed ``/secure/`` URLs."""
+    if settings.DEBUG or storage.is_remote() or getattr(settings, "MEDIA_SIGNING_SECRET", ""):
+        return []
+    return [
+        Error(
+            "MEDIA_SIGNING_SECRET ist nicht gesetzt – unsignierte /media/-Links "
+            "werden von nginx nicht ausgeliefert.",
+            hint="Secret in .env setzen (identisch mit secure_link_md5 in der nginx-Konfiguration).",
+            id="videos.E001",
+        )
+    ]
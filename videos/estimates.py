@@ -0,0 +1,52 @@
+"""Measured encode throughput per worker host, kept in Redis.
+
+Every finished encode records how many megapixels it produced per second
+of wall time; the moving average per host sizes job timeouts and ETAs.
+"""
+
+from __future__ import annotations
+
+import socket
+
+from django.conf import settings
+from django_rq import get_connection
+
+__all__ = [
+    "record",
+    "speeds",
+    "speed",
+]
+
+SPEED_KEY: str = "videoflix:encode_speed"
+SPEED_ALPHA: float = 0.3
+# Megapixels per second assumed until the first encode has been measured
+DEFAULT_SPEED: float = getattr(settings, "VIDEO_DEFAULT_ENCODE_SPEED", 20.0)
+
+
+def record(work: float, seconds: float) -> float | None:
+    """Fold one encode of *work* megapixels in *seconds* into this host's average."""
+    if work <= 0 or seconds <= 0:
+        return None
+    conn = get_connection()
+    host = socket.gethostname()
+    sample = work / seconds
+    old = conn.hget(SPEED_KEY, host)
+    new = sample if old is None else SPEED_ALPHA * sample + (1 - SPEED_ALPHA) * float(old)
+    conn.hset(SPEED_KEY, host, new)
+    return new
+
+
+def speeds() -> dict[str, float]:
+    """Return ``{host: megapixels per second}`` of all measured workers."""
+    return {
+        (k.decode() if isinstance(k, bytes) else k): float(v)
+        for k, v in get_connection().hgetall(SPEED_KEY).items()
+    }
+
+
+def speed(slowest: bool = False) -> float:
+    """Average (or with *slowest* the minimum) encode speed across hosts."""
+    values = list(speeds().values())
+    if not values:
+        return DEFAULT_SPEED
+    return min(values) if slowest else sum(values) / len(values)
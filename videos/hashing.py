@@ -0,0 +1,29 @@
+"""Content hashes of uploaded originals, used to detect duplicate uploads."""
+
+from __future__ import annotations
+
+import hashlib
+
+from django.core.files import File
+
+__all__ = [
+    "HASH_ALGORITHM",
+    "new_hasher",
+    "file_digest",
+]
+
+HASH_ALGORITHM: str = "sha256"
+CHUNK_SIZE: int = 1024 * 1024
+
+
+def new_hasher():
+    """Return an empty hash object to feed upload chunks into."""
+    return hashlib.new(HASH_ALGORITHM)
+
+
+def file_digest(file: File) -> str:
+    """Hex digest of *file*, read in ``CHUNK_SIZE`` chunks (never all at once)."""
+    hasher = new_hasher()
+    for chunk in file.chunks(CHUNK_SIZE):
+        hasher.update(chunk)
+    return hasher.hexdigest()
@@ -0,0 +1,76 @@
+"""Compare the serial, single-decode and chunked transcoding paths."""
+
+from __future__ import annotations
+
+import tempfile
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from videos import tasks
+
+
+class Command(BaseCommand):
+    """``manage.py benchmark_transcode <file>`` – time each encode mode."""
+
+    help = "Encode FILE with every transcoding mode and report wall time."
+
+    def add_arguments(self, parser) -> None:  # noqa: D401
+        """Register CLI arguments."""
+        parser.add_argument("file", type=Path)
+        parser.add_argument(
+            "--chunks",
+            type=int,
+            default=0,
+            help="Chunk count for the chunked mode (default: derived).",
+        )
+        parser.add_argument(
+            "--modes",
+            default="serial,single,chunked",
+            help="Comma-separated modes to run.",
+        )
+
+    def handle(self, *args, **opts) -> None:  # noqa: D401
+        """Run every requested mode in a scratch directory."""
+        src: Path = opts["file"].resolve()
+        if not src.is_file():
+            raise CommandError(f"{src} existiert nicht.")
+
+        meta = tasks.probe(src)
+        ladder = tasks.build_ladder(meta)
+        fps = float(meta.get("fps") or 0)
+        duration = float(meta.get("duration") or 0)
+        chunks = opts["chunks"] or tasks.chunk_count(duration)
+
+        self.stdout.write(
+            f"{src.name}: {duration:.0f}s, {meta.get('height')}p, "
+            f"{len(ladder)} renditions, {chunks} chunks"
+        )
+
+        results: dict[str, float] = {}
+        for mode in opts["modes"].split(","):
+            with tempfile.TemporaryDirectory() as tmp:
+                outputs = [(Path(tmp, f"{tag}.mp4"), h, br) for tag, h, br in ladder]
+                started = time.perf_counter()
+
+                if mode == "serial":
+                    for dst, h, br in outputs:
+                        tasks.run(tasks.rendition_cmd(src, dst, h, br, fps))
+                elif mode == "single":
+                    tasks.run(tasks.ladder_cmd(src, outputs, fps))
+                elif mode == "chunked":
+                    tasks.encode_chunked(
+                        src, outputs, fps, duration, chunks, Path(tmp, "chunks"),
+                    )
+                else:
+                    raise CommandError(f"Unbekannter Modus: {mode}")
+
+                results[mode] = time.perf_counter() - started
+
+        base = "serial" if "serial" in results else next(iter(results))
+        for mode, secs in results.items():
+            self.stdout.write(
+                f"{mode:>8}: {secs:8.1f}s  {duration / secs:5.2f}x realtime  "
+                f"{results[base] / secs:5.2f}x vs. {base}"
+            )
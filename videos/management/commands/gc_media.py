@@ -0,0 +1,171 @@
+"""Find and delete media files no Video references any more."""
+
+from __future__ import annotations
+
+import os
+import time
+import uuid
+from pathlib import PurePosixPath
+from typing import Iterator
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from videos.models import ChunkedUpload, Video
+from videos.tasks import THUMB_EXTRA_FORMATS
+
+# Top-level MEDIA_ROOT directories owned by the pipeline and uploads
+MEDIA_DIRS: tuple[str, ...] = ("videos", "thumbs", "hero")
+FINISHED = (Video.Status.READY, Video.Status.FAILED)
+
+
+def referenced_paths() -> tuple[set[str], set[str]]:
+    """Return ``(files, directories)`` still in use, relative to ``MEDIA_ROOT``.
+
+    Streams plain tuples in one query; whole directories are kept for HLS
+    packages, trickplay sprites, the stills of every video (including
+    ``VIDEO_THUMB_EXTRA_FORMATS``) and the outputs of unfinished pipelines.
+    Partial chunked uploads are not referenced: ``--min-age`` protects the
+    active ones, abandoned ones expire.
+    """
+    files: set[str] = set()
+    dirs: set[str] = set()
+    rows = Video.objects.values_list(
+        "id", "processing_status", "video_file", "source_url", "source_variants",
+        "thumb", "hero_frame", "hls_playlist", "trickplay_vtt",
+    ).iterator(chunk_size=5000)
+    for pk, status, original, source, variants, thumb, hero, hls, vtt in rows:
+        files.update(p for p in (original, source, thumb, hero) if p)
+        files.update(v["path"] for v in variants or () if "path" in v)
+        dirs.update(str(PurePosixPath(p).parent) for p in (hls, vtt) if p)
+        # own stills in every format; adopted ones next to the twin's
+        dirs.update((f"thumbs/{pk}", f"hero/{pk}"))
+        files.update(
+            str(PurePosixPath(p).with_suffix(f".{ext}"))
+            for p in (thumb, hero) if p
+            for ext in THUMB_EXTRA_FORMATS
+        )
+        if status not in FINISHED:
+            dirs.update(f"{name}/{pk}" for name in MEDIA_DIRS)
+    return files, dirs
+
+
+def walk(root: str, rel: str, keep_dirs: set[str]) -> Iterator[tuple[str, os.DirEntry]]:
+    """Yield ``(relative path, entry)`` for every file below *rel*."""
+    try:
+        it = os.scandir(os.path.join(root, rel))
+    except FileNotFoundError:
+        return
+    with it:
+        for entry in it:
+            path = f"{rel}/{entry.name}"
+            if entry.is_dir(follow_symlinks=False):
+                if path not in keep_dirs:
+                    yield from walk(root, path, keep_dirs)
+            else:
+                yield path, entry
+
+
+class Command(BaseCommand):
+    """``manage.py gc_media`` – remove orphaned renditions, thumbs and uploads."""
+
+    help = (
+        "Walk the media directories and delete files that no Video references "
+        "(failed jobs, upload leftovers, thumbs of deleted rows)."
+    )
+
+    def add_arguments(self, parser) -> None:  # noqa: D401
+        """Register CLI arguments."""
+        parser.add_argument(
+            "--dry-run", action="store_true", help="Only report, delete nothing.",
+        )
+        parser.add_argument(
+            "--min-age", type=float, default=24.0,
+            help="Ignore files modified within this many hours.",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000, help="Files per batch.")
+
+    def handle(self, *args, **opts) -> None:  # noqa: D401
+        """Collect references, scan ``MEDIA_ROOT`` and purge orphans."""
+        started = time.monotonic()
+        root = str(settings.MEDIA_ROOT)
+        files, keep_dirs = referenced_paths()
+        self.stdout.write(
+            f"{len(files)} Dateien und {len(keep_dirs)} Verzeichnisse referenziert "
+            f"({time.monotonic() - started:.1f} s)."
+        )
+
+        dry_run = opts["dry_run"]
+        cutoff = time.time() - opts["min_age"] * 3600
+        scanned = orphans = freed = 0
+        batch: list[str] = []
+        touched: set[str] = set()
+
+        for top in MEDIA_DIRS:
+            for rel, entry in walk(root, top, keep_dirs):
+                scanned += 1
+                if rel in files:
+                    continue
+                stat = entry.stat(follow_symlinks=False)
+                if stat.st_mtime > cutoff:
+                    continue
+                orphans += 1
+                freed += stat.st_size
+                batch.append(rel)
+                if len(batch) >= opts["batch_size"]:
+                    self.flush(root, batch, touched, dry_run)
+
+        self.flush(root, batch, touched, dry_run)
+        if not dry_run:
+            self.prune(root, touched)
+            expired = self.expire_uploads(touched)
+            if expired:
+                self.stdout.write(f"  {expired} abgebrochene Upload(s) entfernt")
+
+        elapsed = max(time.monotonic() - started, 1e-6)
+        verb = "gefunden" if dry_run else "gelöscht"
+        self.stdout.write(self.style.SUCCESS(
+            f"{scanned} Dateien geprüft, {orphans} verwaist {verb} "
+            f"({freed / 1024**2:.1f} MB) in {elapsed:.1f} s "
+            f"({scanned / elapsed:.0f} Dateien/s)."
+        ))
+
+    def flush(self, root: str, batch: list[str], touched: set[str], dry_run: bool) -> None:
+        """Report (and unless *dry_run* delete) *batch*, then clear it."""
+        for rel in batch:
+            if dry_run:
+                self.stdout.write(f"  {rel}")
+                continue
+            try:
+                os.unlink(os.path.join(root, rel))
+            except FileNotFoundError:
+                pass
+            touched.add(str(PurePosixPath(rel).parent))
+        if batch and not dry_run:
+            self.stdout.write(f"  -{len(batch)} Dateien")
+        batch.clear()
+
+    def expire_uploads(self, dirs: set[str]) -> int:
+        """Delete unfinished :class:`ChunkedUpload` rows whose file was purged."""
+        ids = []
+        for rel in dirs:
+            parts = PurePosixPath(rel).parts
+            if parts[:2] == ("videos", "uploads") and len(parts) == 3:
+                try:
+                    ids.append(uuid.UUID(parts[2]))
+                except ValueError:
+                    continue
+        if not ids:
+            return 0
+        return ChunkedUpload.objects.filter(pk__in=ids, video__isnull=True).delete()[0]
+
+    def prune(self, root: str, dirs: set[str]) -> None:
+        """Remove directories left empty, deepest first, up to ``MEDIA_DIRS``."""
+        for rel in sorted(dirs, key=lambda d: d.count("/"), reverse=True):
+            path = PurePosixPath(rel)
+            while len(path.parts) > 1:
+                try:
+                    os.rmdir(os.path.join(root, path))
+                except OSError:  # not empty (or already gone)
+                    break
+                path = path.parent
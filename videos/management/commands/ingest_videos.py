@@ -0,0 +1,182 @@
+"""Bulk-load a back catalog from a directory or CSV manifest."""
+
+from __future__ import annotations
+
+import csv
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+
+from videos import storage, tasks
+from videos.hashing import file_digest
+from videos.models import Video
+from videos.serializers import VIDEO_EXTENSIONS
+
+MANIFEST_FIELDS = ("title", "description", "category", "genre", "director", "release")
+TRUE_VALUES = {"1", "true", "yes", "ja", "x"}
+
+
+def read_entries(source: Path) -> list[dict[str, str]]:
+    """Return one dict per original: ``path`` plus optional manifest fields."""
+    if source.is_dir():
+        return [
+            {"path": str(path)}
+            for path in sorted(source.rglob("*"))
+            if path.is_file() and path.suffix.lower().lstrip(".") in VIDEO_EXTENSIONS
+        ]
+
+    with source.open(newline="", encoding="utf-8") as fh:
+        rows = list(csv.DictReader(fh))
+    if rows and "path" not in rows[0]:
+        raise CommandError("Das Manifest braucht eine Spalte 'path'.")
+    for row in rows:
+        row["path"] = str((source.parent / row["path"]).resolve())
+    return rows
+
+
+def inspect(entry: dict[str, str], known: set[str]) -> dict[str, object]:
+    """Hash and (for new content) probe one original; runs in a worker thread."""
+    path = Path(entry["path"])
+    try:
+        with path.open("rb") as fh:
+            digest = file_digest(File(fh))
+        if digest in known:
+            return {**entry, "hash": digest, "known": True}
+        return {**entry, "hash": digest, "meta": tasks.probe(path), "bytes": path.stat().st_size}
+    except Exception as exc:  # noqa: BLE001 – reported, not fatal
+        return {**entry, "error": f"{type(exc).__name__}: {exc}"}
+
+
+def media_name(path: Path, digest: str) -> str:
+    """Storage name of *path*; files outside the media storage are linked in.
+
+    With remote storage the linked copy is uploaded and removed again.
+    """
+    media_root = Path(settings.MEDIA_ROOT).resolve()
+    path = path.resolve()
+    if not storage.is_remote() and path.is_relative_to(media_root):
+        return path.relative_to(media_root).as_posix()
+
+    name = f"videos/ingest/{digest}/{path.name}"
+    target = storage.local_path(name)
+    if not storage.exists(target):
+        target.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            os.link(path, target)
+        except OSError:  # other file system
+            shutil.copy2(path, target)
+        storage.publish(target)
+    return name
+
+
+def build_video(item: dict[str, object]) -> Video:
+    """Unsaved :class:`Video` for one inspected original."""
+    path = Path(item["path"])
+    meta = item["meta"]
+    fields = {k: item[k] for k in MANIFEST_FIELDS if item.get(k)}
+    fields.setdefault("title", path.stem.replace("_", " "))
+    return Video(
+        **fields,
+        is_trailer=str(item.get("is_trailer", "")).strip().lower() in TRUE_VALUES,
+        video_file=media_name(path, item["hash"]),
+        content_hash=item["hash"],
+        media_info=meta,
+        duration=round(meta["duration"]) or None,
+        processing_status=Video.Status.PENDING,
+        processing_stage=tasks.INGEST_STAGE,
+    )
+
+
+class Command(BaseCommand):
+    """``manage.py ingest_videos <dir|manifest.csv>`` – bulk import originals."""
+
+    help = (
+        "Hash and probe originals in parallel, bulk-create Video rows without "
+        "signals and enqueue their pipelines in throttled batches. Re-running "
+        "skips content that is already imported."
+    )
+
+    def add_arguments(self, parser) -> None:  # noqa: D401
+        """Register CLI arguments."""
+        parser.add_argument("source", type=Path, help="Directory or CSV manifest.")
+        parser.add_argument("--workers", type=int, default=8, help="Probe threads.")
+        parser.add_argument("--batch-size", type=int, default=500, help="Rows per INSERT.")
+        parser.add_argument(
+            "--enqueue-batch", type=int, default=tasks.ENQUEUE_BATCH,
+            help="Pipelines enqueued per batch.",
+        )
+        parser.add_argument(
+            "--enqueue-pause", type=float, default=tasks.ENQUEUE_PAUSE,
+            help="Seconds between enqueue batches.",
+        )
+        parser.add_argument(
+            "--no-enqueue", action="store_true", help="Only create rows, start nothing.",
+        )
+
+    def handle(self, *args, **opts) -> None:  # noqa: D401
+        """Ingest every new original and report throughput."""
+        source: Path = opts["source"].resolve()
+        if not source.exists():
+            raise CommandError(f"{source} existiert nicht.")
+
+        entries = read_entries(source)
+        known = set(
+            Video.objects.exclude(content_hash="")
+            .values_list("content_hash", flat=True)
+            .iterator()
+        )
+        self.stdout.write(f"{len(entries)} Datei(en) gefunden, {len(known)} Hashes bekannt.")
+
+        started = time.monotonic()
+        created = skipped = failed = total_bytes = 0
+        batch: list[Video] = []
+
+        with ThreadPoolExecutor(max_workers=opts["workers"]) as pool:
+            for item in pool.map(lambda e: inspect(e, known), entries):
+                if "error" in item:
+                    failed += 1
+                    self.stderr.write(f"✖ {item['path']}: {item['error']}")
+                    continue
+                if item.get("known") or item["hash"] in known:
+                    skipped += 1
+                    continue
+
+                known.add(item["hash"])
+                total_bytes += item["bytes"]
+                batch.append(build_video(item))
+                if len(batch) >= opts["batch_size"]:
+                    created += self.flush(batch, started, total_bytes)
+
+        created += self.flush(batch, started, total_bytes)
+
+        # includes rows left waiting by an interrupted earlier run
+        enqueued = 0 if opts["no_enqueue"] else tasks.start_waiting_pipelines(
+            opts["enqueue_batch"], opts["enqueue_pause"], report=self.stdout.write,
+        )
+
+        elapsed = max(time.monotonic() - started, 1e-6)
+        self.stdout.write(self.style.SUCCESS(
+            f"{created} angelegt, {skipped} bereits vorhanden, {failed} Fehler, "
+            f"{enqueued} Pipeline(s) gestartet in {elapsed:.1f} s "
+            f"({len(entries) / elapsed:.1f} Dateien/s, "
+            f"{total_bytes / elapsed / 1024**2:.1f} MB/s)."
+        ))
+
+    def flush(self, batch: list[Video], started: float, total_bytes: int) -> int:
+        """Insert *batch* in one statement (no signals fire) and clear it."""
+        if not batch:
+            return 0
+        Video.objects.bulk_create(batch)
+        count = len(batch)
+        batch.clear()
+        elapsed = max(time.monotonic() - started, 1e-6)
+        self.stdout.write(
+            f"  +{count} Videos ({total_bytes / elapsed / 1024**2:.1f} MB/s eingelesen)"
+        )
+        return count
@@ -0,0 +1,43 @@
+"""Re-queue unfinished video pipelines, e.g. after a worker restart."""
+
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand
+
+from videos.models import Video
+from videos.tasks import resume_pipeline
+
+
+class Command(BaseCommand):
+    """``manage.py resume_pipeline`` – continue interrupted processing."""
+
+    help = "Enqueue the next pipeline stage for every unfinished video."
+
+    def add_arguments(self, parser) -> None:  # noqa: D401
+        """Register CLI arguments."""
+        parser.add_argument(
+            "--failed",
+            action="store_true",
+            help="Also restart videos whose retries are exhausted.",
+        )
+
+    def handle(self, *args, **opts) -> None:  # noqa: D401
+        """Resume every matching video and report the chosen stage."""
+        skip = [Video.Status.READY]
+        if not opts["failed"]:
+            skip.append(Video.Status.FAILED)
+
+        ids = (
+            Video.objects.exclude(processing_status__in=skip)
+            .exclude(video_file="")
+            .exclude(video_file=None)
+            .values_list("id", flat=True)
+        )
+        resumed = 0
+        for video_id in ids.iterator():
+            stage = resume_pipeline(video_id)
+            if stage:
+                resumed += 1
+                self.stdout.write(f"#{video_id}: {stage}")
+
+        self.stdout.write(self.style.SUCCESS(f"{resumed} Video(s) fortgesetzt."))
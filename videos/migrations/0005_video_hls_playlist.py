@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-18 19:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('videos', '0004_alter_watchprogress_duration_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='video',
+            name='hls_playlist',
+            field=models.CharField(blank=True, editable=False, max_length=500, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-18 19:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('videos', '0005_video_hls_playlist'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='video',
+            name='media_info',
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-18 19:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('videos', '0006_video_media_info'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='video',
+            name='trickplay_vtt',
+            field=models.CharField(blank=True, editable=False, max_length=500, null=True),
+        ),
+    ]
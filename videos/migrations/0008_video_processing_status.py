@@ -0,0 +1,46 @@
+# Generated by Django 5.2.1 on 2026-10-18 19:46
+
+from django.db import migrations, models
+
+
+def mark_processed_ready(apps, schema_editor):
+    """Existing uploads with variants and a thumbnail are already done."""
+    Video = apps.get_model("videos", "Video")
+    Video.objects.exclude(source_variants=None).exclude(thumb="").exclude(
+        thumb=None
+    ).update(processing_status="ready")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('videos', '0007_video_trickplay_vtt'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='video',
+            name='processing_attempts',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='video',
+            name='processing_error',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='video',
+            name='processing_stage',
+            field=models.CharField(blank=True, editable=False, max_length=30),
+        ),
+        migrations.AddField(
+            model_name='video',
+            name='processing_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('probed', 'Probed'), ('encoding', 'Encoding'), ('packaged', 'Packaged'), ('thumbnailed', 'Thumbnailed'), ('ready', 'Ready'), ('failed', 'Failed')], default='pending', editable=False, max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='video',
+            index=models.Index(fields=['processing_status'], name='videos_vide_process_ea15ac_idx'),
+        ),
+        migrations.RunPython(mark_processed_ready, migrations.RunPython.noop),
+    ]
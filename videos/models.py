@@ -2,15 +2,21 @@ from __future__ import annotations
 
 """Video and WatchProgress models."""
 
+import uuid
+from pathlib import Path
+
 from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.core.validators import FileExtensionValidator, URLValidator
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 
+from . import storage
+
 __all__ = [
     "Video",
     "WatchProgress",
+    "ChunkedUpload",
 ]
 
 
@@ -38,6 +44,17 @@ class Video(models.Model):
         DRAMA = "Drama", _("Drama")
         ROM = "Romance", _("Romance")
 
+    class Status(models.TextChoices):
+        PENDING = "pending", _("Pending")
+        PROBED = "probed", _("Probed")
+        ENCODING = "encoding", _("Encoding")
+        PACKAGED = "packaged", _("Packaged")
+        THUMBNAILED = "thumbnailed", _("Thumbnailed")
+        READY = "ready", _("Ready")
+        FAILED = "failed", _("Failed")
+
+    REQUIRED_HEIGHTS = (720, 360)
+
     title = models.CharField(max_length=255)
     description = models.TextField(blank=True)
 
@@ -76,15 +93,47 @@ class Video(models.Model):
         editable=False,
     )
     source_variants = models.JSONField(blank=True, null=True)
+    media_info = models.JSONField(blank=True, null=True, editable=False)
+    content_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        db_index=True,
+        editable=False,
+    )
+    trickplay_vtt = models.CharField(
+        max_length=500,
+        blank=True,
+        null=True,
+        editable=False,
+    )
+    hls_playlist = models.CharField(
+        max_length=500,
+        blank=True,
+        null=True,
+        editable=False,
+    )
 
     thumb = models.ImageField(upload_to=thumb_upload_to, blank=True, null=True)
     hero_frame = models.ImageField(upload_to=hero_upload_to, blank=True, null=True)
 
+    processing_status = models.CharField(
+        max_length=20,
+        choices=Status.choices,
+        default=Status.PENDING,
+        editable=False,
+    )
+    processing_stage = models.CharField(max_length=30, blank=True, editable=False)
+    processing_attempts = models.JSONField(default=dict, blank=True, editable=False)
+    processing_error = models.TextField(blank=True, editable=False)
+
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         ordering = ("-created_at",)
-        indexes = [models.Index(fields=["created_at"])]
+        indexes = [
+            models.Index(fields=["created_at"]),
+            models.Index(fields=["processing_status"]),
+        ]
 
     def clean(self) -> None:
         """Require either an external URL or an uploaded file."""
@@ -100,11 +149,20 @@ class Video(models.Model):
 
     @property
     def variants_ready(self) -> bool:
-        """True when 720 p and 360 p MP4 variants exist."""
+        """True when the top rendition and all required lower rungs exist.
+
+        Required rungs are 720 p and 360 p, limited to heights below the
+        rendition marked as ``top``. Ladders without a ``top`` marker
+        (created before source-aware ladders) need both.
+        """
         if not self.source_variants:
             return False
         heights = {v["height"] for v in self.source_variants}
-        return {720, 360}.issubset(heights)
+        top = next((v["height"] for v in self.source_variants if v.get("top")), None)
+        if top is None:
+            return set(self.REQUIRED_HEIGHTS).issubset(heights)
+        required = {top} | {h for h in self.REQUIRED_HEIGHTS if h < top}
+        return required.issubset(heights)
 
     def get_variant(self, height: int) -> str | None:
         """Return path of the variant with the requested height, if present."""
@@ -133,3 +191,63 @@ class WatchProgress(models.Model):
     def __str__(self) -> str:  # noqa: Dunder
         """Readable progress representation."""
         return f"{self.user} @ {self.video} → {self.position:.1f}s"
+
+
+class ChunkedUpload(models.Model):
+    """Resumable upload of an original, written chunk by chunk to disk.
+
+    The file grows in place at ``videos/uploads/<id>/<filename>``; on
+    finalize it becomes the ``video_file`` of a new :class:`Video` without
+    being copied.
+    """
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="chunked_uploads",
+    )
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    offset = models.PositiveBigIntegerField(default=0)
+
+    title = models.CharField(max_length=255)
+    description = models.TextField(blank=True)
+    category = models.CharField(
+        max_length=30,
+        choices=Video.Category.choices,
+        default=Video.Category.NEW,
+    )
+    is_trailer = models.BooleanField(default=False)
+
+    video = models.OneToOneField(
+        Video,
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name="chunked_upload",
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ("-created_at",)
+
+    def __str__(self) -> str:  # noqa: Dunder
+        """Readable upload state."""
+        return f"{self.filename} ({self.offset}/{self.size} B)"
+
+    @property
+    def name(self) -> str:
+        """Storage name of the file."""
+        return f"videos/uploads/{self.id}/{self.filename}"
+
+    @property
+    def path(self) -> Path:
+        """Local path of the (partial) file, in the scratch directory if remote."""
+        return storage.local_path(self.name)
+
+    @property
+    def complete(self) -> bool:
+        """True once every byte has been received."""
+        return self.offset == self.size
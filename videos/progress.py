@@ -0,0 +1,42 @@
+"""Live transcode progress, published to Redis by the FFmpeg tasks."""
+
+from __future__ import annotations
+
+import json
+
+from django.conf import settings
+from django_rq import get_connection
+
+__all__ = [
+    "publish",
+    "read",
+    "clear",
+]
+
+PROGRESS_TTL: int = getattr(settings, "VIDEO_PROGRESS_TTL", 60 * 60 * 24)
+
+
+def _key(video_id: int) -> str:
+    """Redis hash holding one JSON entry per pipeline stage."""
+    return f"videoflix:progress:{video_id}"
+
+
+def publish(video_id: int, stage: str, data: dict[str, float]) -> None:
+    """Store the latest *data* snapshot for *stage* of *video_id*."""
+    conn = get_connection()
+    conn.hset(_key(video_id), stage, json.dumps(data))
+    conn.expire(_key(video_id), PROGRESS_TTL)
+
+
+def read(video_id: int) -> dict[str, dict[str, float]]:
+    """Return ``{stage: snapshot}`` for *video_id* (empty if idle)."""
+    raw = get_connection().hgetall(_key(video_id))
+    return {
+        (k.decode() if isinstance(k, bytes) else k): json.loads(v)
+        for k, v in raw.items()
+    }
+
+
+def clear(video_id: int) -> None:
+    """Drop all progress entries of *video_id*."""
+    get_connection().delete(_key(video_id))
@@ -2,22 +2,32 @@
 
 from __future__ import annotations
 
+from pathlib import PurePath
+
 from django.conf import settings
+from django.utils.text import get_valid_filename
 from rest_framework import serializers
 
-from .models import Video, WatchProgress
+from .models import ChunkedUpload, Video, WatchProgress
+from .signing import file_url, media_url
 
 __all__ = [
     "VideoSerializer",
     "ProgressSerializer",
+    "ChunkedUploadSerializer",
 ]
 
+VIDEO_EXTENSIONS: tuple[str, ...] = ("mp4", "mov", "mkv", "m4v")
+UPLOAD_MAX_BYTES: int = getattr(settings, "VIDEO_UPLOAD_MAX_BYTES", 20 * 1024**3)
+
 
 class VideoSerializer(serializers.ModelSerializer):
     """Serialize a :class:`Video` instance to JSON."""
 
     video_file_url = serializers.SerializerMethodField()
     sources = serializers.SerializerMethodField()
+    hls_url = serializers.SerializerMethodField()
+    trickplay_url = serializers.SerializerMethodField()
 
     class Meta:
         model = Video
@@ -26,6 +36,10 @@ class VideoSerializer(serializers.ModelSerializer):
             "title_en",
             "description_de",
             "description_en",
+            "processing_stage",
+            "processing_attempts",
+            "processing_error",
+            "content_hash",
         )
         read_only_fields = (
             "source_url",
@@ -61,10 +75,12 @@ class VideoSerializer(serializers.ModelSerializer):
             or instance.description
         )
         if request:
-            for key in ("thumb", "hero_frame", "source_url"):
-                val = rep.get(key)
-                if val and not str(val).startswith(("http://", "https://")):
-                    rep[key] = request.build_absolute_uri(settings.MEDIA_URL + val)
+            for key in ("video_file", "thumb", "hero_frame"):
+                if getattr(instance, key):
+                    rep[key] = file_url(request, getattr(instance, key))
+            val = rep.get("source_url")
+            if val and not str(val).startswith(("http://", "https://")):
+                rep["source_url"] = media_url(request, val)
         return rep
 
     # ------------------------------------------------------------------
@@ -78,10 +94,10 @@ class VideoSerializer(serializers.ModelSerializer):
             return None
 
         if obj.source_url:
-            return request.build_absolute_uri(settings.MEDIA_URL + obj.source_url)
+            return media_url(request, obj.source_url)
 
         if obj.video_file:
-            return request.build_absolute_uri(obj.video_file.url)
+            return file_url(request, obj.video_file)
 
         return None
 
@@ -94,13 +110,27 @@ class VideoSerializer(serializers.ModelSerializer):
         ordered = sorted(obj.source_variants, key=lambda v: v["height"], reverse=True)
         return [
             {
-                "src": request.build_absolute_uri(settings.MEDIA_URL + v["path"]),
+                "src": media_url(request, v["path"]),
                 "type": "video/mp4",
                 "size": v["height"],
             }
             for v in ordered
         ]
 
+    def get_hls_url(self, obj: Video) -> str | None:  # noqa: D401
+        """Absolute URL to the HLS master playlist, if packaged."""
+        request = self.context.get("request")
+        if not (request and obj.hls_playlist):
+            return None
+        return media_url(request, obj.hls_playlist)
+
+    def get_trickplay_url(self, obj: Video) -> str | None:  # noqa: D401
+        """Absolute URL to the WebVTT seek-preview track, if generated."""
+        request = self.context.get("request")
+        if not (request and obj.trickplay_vtt):
+            return None
+        return media_url(request, obj.trickplay_vtt)
+
     # ------------------------------------------------------------------
     # Validation
     # ------------------------------------------------------------------
@@ -127,3 +157,40 @@ class ProgressSerializer(serializers.ModelSerializer):
             "updated",
         )
         read_only_fields = ("updated",)
+
+
+class ChunkedUploadSerializer(serializers.ModelSerializer):
+    """Create and report resumable uploads (:class:`ChunkedUpload`)."""
+
+    class Meta:
+        model = ChunkedUpload
+        fields = (
+            "id",
+            "filename",
+            "size",
+            "offset",
+            "title",
+            "description",
+            "category",
+            "is_trailer",
+            "video",
+            "complete",
+        )
+        read_only_fields = ("offset", "video", "complete")
+
+    def validate_filename(self, value: str) -> str:  # noqa: D401
+        """Strip directories and allow video containers only."""
+        name = get_valid_filename(PurePath(value).name)
+        if PurePath(name).suffix.lower().lstrip(".") not in VIDEO_EXTENSIONS:
+            raise serializers.ValidationError(
+                f"Nur {', '.join(VIDEO_EXTENSIONS)}‑Dateien sind erlaubt.",
+            )
+        return name
+
+    def validate_size(self, value: int) -> int:  # noqa: D401
+        """Reject empty files and files above ``VIDEO_UPLOAD_MAX_BYTES``."""
+        if not 0 < value <= UPLOAD_MAX_BYTES:
+            raise serializers.ValidationError(
+                f"Die Dateigröße muss zwischen 1 und {UPLOAD_MAX_BYTES} Bytes liegen.",
+            )
+        return value
@@ -2,46 +2,95 @@
 
 from __future__ import annotations
 
-import shutil
-from pathlib import Path
+import functools
+from pathlib import PurePosixPath
 
-from django.conf import settings
-from django.db.models.signals import post_delete, post_save
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
-from django_rq import enqueue
 
+from .hashing import file_digest
 from .models import Video
-from .tasks import create_variants
+from .tasks import (
+    cancel_pipeline,
+    enqueue_stage,
+    probe_source,
+    purge_later,
+    wake_twins,
+)
+
+
+@receiver(pre_save, sender=Video)
+def hash_upload(sender, instance: Video, **_: object) -> None:
+    """Stream a content hash of a new or replaced upload into ``content_hash``.
+
+    Only uncommitted files (admin or form uploads) are hashed here; rows
+    pointing at a stored path are hashed once by ``probe_source`` in the
+    worker instead of inside the request.
+    """
+    upload = instance.video_file
+    if not upload or upload._committed:
+        return
+    instance.content_hash = file_digest(upload)
 
 
 @receiver(post_save, sender=Video)
 def enqueue_pipeline(sender, instance: Video, created: bool, **_: object) -> None:
-    """Queue FFmpeg variant creation after a new upload."""
+    """Queue the probe stage (and thereby the FFmpeg pipeline) after a new upload.
+
+    Deferred until the row has committed, so a fast worker never misses it.
+    """
     if created and instance.video_file:
-        enqueue(create_variants, instance.id, job_timeout=7200)
+        transaction.on_commit(functools.partial(enqueue_stage, probe_source, instance.id))
 
 
 @receiver(post_delete, sender=Video)
-def cleanup_files(sender, instance: Video, **_: object) -> None:
-    """Delete originals, MP4 variants and thumbs after a video is removed."""
-    media_root = Path(settings.MEDIA_ROOT)
+def cancel_jobs(sender, instance: Video, **_: object) -> None:
+    """Cancel queued pipeline jobs and stop running FFmpeg for a deleted video.
 
-    if instance.video_file and instance.video_file.path:
-        Path(instance.video_file.path).unlink(missing_ok=True)
+    Deferred until the delete has committed: a rolled-back delete must not
+    leave the video with cancelled jobs and a cancel flag that drops every
+    later enqueue. Duplicates waiting on the video are re-probed.
+    """
+    transaction.on_commit(functools.partial(cancel_pipeline, instance.id))
+    if instance.content_hash:
+        transaction.on_commit(functools.partial(wake_twins, instance.content_hash))
 
+
+@receiver(post_delete, sender=Video)
+def cleanup_files(sender, instance: Video, **_: object) -> None:
+    """Purge originals, MP4 variants, HLS, trickplay and thumbs after removal.
+
+    The paths are handed to a background job once the transaction has
+    committed, so (bulk) deletes do not wait for the file system. Outputs
+    are shared between videos with the same ``content_hash``; they are
+    only deleted together with the last video referencing them.
+    """
     paths: list[str] = []
-    if instance.source_url:
-        paths.append(instance.source_url)
-    if instance.source_variants:
-        paths.extend(
-            v["path"] for v in instance.source_variants if "path" in v
-        )
+    if instance.video_file:
+        paths.append(instance.video_file.name)
+
+    shared = instance.content_hash and Video.objects.filter(
+        content_hash=instance.content_hash,
+    ).exists()
+    if not shared:
+        if instance.source_url:
+            paths.append(instance.source_url)
+        if instance.source_variants:
+            paths.extend(
+                v["path"] for v in instance.source_variants if "path" in v
+            )
 
-    for rel in paths:
-        (media_root / rel).unlink(missing_ok=True)
+        # renditions, HLS, trickplay, thumbs, hero and leftover *.part files
+        paths.extend(f"{name}/{instance.id}" for name in ("videos", "thumbs", "hero"))
 
-    thumb_dir = media_root / "thumbs" / str(instance.id)
-    hero_dir = media_root / "hero" / str(instance.id)
+        # directories of outputs adopted from an already deleted twin
+        for rel in (instance.hls_playlist, instance.trickplay_vtt):
+            if rel:
+                paths.append(str(PurePosixPath(rel).parent))
+        for image in (instance.thumb, instance.hero_frame):
+            if image:
+                paths.append(str(PurePosixPath(image.name).parent))
 
-    shutil.rmtree(thumb_dir, ignore_errors=True)
-    shutil.rmtree(hero_dir, ignore_errors=True)
+    if paths:
+        transaction.on_commit(functools.partial(purge_later, paths))
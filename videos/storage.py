@@ -0,0 +1,136 @@
+"""Where the pipeline reads originals and publishes its outputs.
+
+By default everything lives in ``MEDIA_ROOT`` and is written in place.
+With an object store (S3, MinIO) as Django's default storage, ffmpeg
+writes to the local scratch directory ``VIDEO_SCRATCH_ROOT``, finished
+outputs are uploaded through the storage API and inputs are streamed
+from storage URLs – worker nodes need no shared media volume.
+
+HLS playlists and trickplay VTTs reference their segments and sprites by
+relative path; a presigned URL cannot cover those, so the ``hls/`` and
+``trickplay/`` prefixes are served unsigned through the ``public_media``
+storage and must be public-read in the bucket (see DEPLOYMENT.md).
+"""
+
+from __future__ import annotations
+
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path, PurePosixPath
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage, storages
+
+__all__ = [
+    "is_remote",
+    "scratch_root",
+    "local_path",
+    "name_of",
+    "input_path",
+    "exists",
+    "url",
+    "publish",
+    "remove",
+]
+
+# Files uploaded in parallel; large ones are split into multipart chunks
+# by the storage backend itself (see ``transfer_config`` in settings)
+UPLOAD_WORKERS: int = getattr(settings, "VIDEO_UPLOAD_WORKERS", 8)
+# Output directories (``videos/<id>/<dir>/``) that must be readable unsigned
+PUBLIC_DIRS: tuple[str, ...] = ("hls", "trickplay")
+PUBLIC_STORAGE: str = "public_media"
+
+
+def is_remote() -> bool:
+    """``True`` if the default storage is not the local file system."""
+    try:
+        default_storage.path("")
+    except NotImplementedError:
+        return True
+    return False
+
+
+def scratch_root() -> Path:
+    """Directory ffmpeg writes to: ``MEDIA_ROOT`` itself unless remote."""
+    if is_remote():
+        return Path(getattr(settings, "VIDEO_SCRATCH_ROOT", None) or settings.MEDIA_ROOT)
+    return Path(settings.MEDIA_ROOT)
+
+
+def local_path(*parts: str) -> Path:
+    """Local (scratch) path of the storage name joined from *parts*."""
+    return Path(scratch_root(), *parts)
+
+
+def name_of(path: Path) -> str:
+    """Storage name of the local *path*."""
+    return path.relative_to(scratch_root()).as_posix()
+
+
+def input_path(name: str) -> str:
+    """Path or URL ffmpeg/ffprobe can read the stored file *name* from.
+
+    A local copy wins; remote files are streamed over HTTP(S) with range
+    requests instead of being downloaded first.
+    """
+    path = local_path(name)
+    if not is_remote() or path.exists():
+        return str(path)
+    return default_storage.url(name)
+
+
+def is_public(name: str) -> bool:
+    """Whether *name* lies in an HLS or trickplay directory."""
+    parts = PurePosixPath(name).parts
+    return len(parts) > 3 and parts[0] == "videos" and parts[2] in PUBLIC_DIRS
+
+
+def url(name: str) -> str:
+    """Client URL of the stored file *name*: presigned, or plain if public."""
+    if is_public(name) and PUBLIC_STORAGE in settings.STORAGES:
+        return storages[PUBLIC_STORAGE].url(name)
+    return default_storage.url(name)
+
+
+def exists(path: Path) -> bool:
+    """Whether *path* exists locally or was already published."""
+    return path.exists() or (is_remote() and default_storage.exists(name_of(path)))
+
+
+def publish(*paths: Path) -> None:
+    """Upload finished files or directories *paths* and drop the local copy.
+
+    A no-op on local storage, where outputs are already in place.
+    """
+    if not is_remote():
+        return
+    files = [
+        f
+        for path in paths
+        for f in ([path] if path.is_file() else sorted(path.rglob("*")))
+        if f.is_file()
+    ]
+    with ThreadPoolExecutor(max_workers=UPLOAD_WORKERS) as pool:
+        list(pool.map(upload, files))
+    for path in paths:
+        if path.is_dir():
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            path.unlink(missing_ok=True)
+
+
+def upload(path: Path) -> str:
+    """Store *path* under its own name (the backend must overwrite)."""
+    with path.open("rb") as fh:
+        return default_storage.save(name_of(path), File(fh, name=path.name))
+
+
+def remove(name: str) -> None:
+    """Delete the stored file or directory *name* (recursively)."""
+    dirs, files = default_storage.listdir(name)
+    for sub in dirs:
+        remove(f"{name}/{sub}")
+    for file in files:
+        default_storage.delete(f"{name}/{file}")
+    default_storage.delete(name)
@@ -1,15 +1,32 @@
-"""FFmpeg tasks: create MP4 renditions and thumbnails."""
+"""FFmpeg tasks: create MP4 renditions, HLS packages and thumbnails."""
 
 from __future__ import annotations
 
+import functools
 import json
+import math
+import os
+import shutil
 import subprocess
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Final
+from typing import Final, Iterator
 
 from django.conf import settings
-from django_rq import enqueue
+from django.db import transaction
+from django_rq import get_connection, get_queue
+from redis.exceptions import LockError
+from rq import Retry
+from rq.exceptions import NoSuchJobError
+from rq.job import Job, JobStatus
+from rq.worker import Worker
 
+from . import estimates, progress, storage
+from .hashing import file_digest
 from .models import Video
 
 RENDITIONS: Final[list[tuple[str, int, str]]] = [
@@ -22,107 +39,1284 @@ RENDITIONS: Final[list[tuple[str, int, str]]] = [
 FFMPEG = settings.__dict__.get("FFMPEG_BINARY", "ffmpeg")
 FFPROBE = settings.__dict__.get("FFPROBE_BINARY", "ffprobe")
 
+# "single": decode once, encode the whole ladder in one ffmpeg process.
+# "serial": one ffmpeg process per rendition (legacy behaviour).
+# "fanout": one RQ job per rendition, joined by finalize_variants.
+# "chunked": split long sources at keyframes and encode chunks in parallel.
+TRANSCODE_MODE: str = getattr(settings, "VIDEO_TRANSCODE_MODE", "single")
 
-def run(cmd: list[str]) -> None:
-    """Execute *cmd* via ``subprocess`` and abort on non‑zero exit."""
+CHUNK_MIN_SECONDS: int = getattr(settings, "VIDEO_CHUNK_MIN_SECONDS", 120)
+# None: one chunk per CPU the container may use (see available_cpus)
+CHUNK_WORKERS: int | None = getattr(settings, "VIDEO_CHUNK_WORKERS", None)
+CGROUP_CPU_MAX: Final[Path] = Path("/sys/fs/cgroup/cpu.max")
+
+HLS_SEGMENT_SECONDS: int = getattr(settings, "VIDEO_HLS_SEGMENT_SECONDS", 6)
+H264_PROFILES: Final[dict[str, str]] = {
+    "Constrained Baseline": "42e0",
+    "Baseline": "4200",
+    "Main": "4d00",
+    "High": "6400",
+}
+
+STDERR_TAIL_LINES: Final[int] = 40
+STAGE_RETRY: Final[Retry] = Retry(max=3, interval=[30, 120, 600])
+ACTIVE_JOB_STATES: Final[set[str]] = {
+    JobStatus.QUEUED,
+    JobStatus.STARTED,
+    JobStatus.DEFERRED,
+    JobStatus.SCHEDULED,
+}
+# Videos with the same content_hash share these outputs instead of re-encoding
+DEDUPE_STAGE: Final[str] = "dedupe"
+DEDUPE_FIELDS: Final[tuple[str, ...]] = (
+    "media_info",
+    "source_url",
+    "source_variants",
+    "hls_playlist",
+    "trickplay_vtt",
+    "thumb",
+    "hero_frame",
+)
+
+# Bulk-created rows (ingest command, admin import) wait here for their pipeline
+INGEST_STAGE: Final[str] = "ingest"
+ENQUEUE_BATCH: Final[int] = 50
+ENQUEUE_PAUSE: Final[float] = 1.0
+
+# Media paths of deleted videos wait in this list for one purge job
+PURGE_KEY: Final[str] = "videoflix:purge"
+PURGE_SCHEDULED_KEY: Final[str] = "videoflix:purge:scheduled"
+PURGE_BATCH: Final[int] = 500
+
+# Encode jobs get TIMEOUT_FACTOR × the estimate at the slowest worker speed
+TIMEOUT_FACTOR: Final[float] = 3.0
+MIN_JOB_TIMEOUT: Final[int] = 600
+MAX_JOB_TIMEOUT: Final[int] = 12 * 3600
+# Stream copies are sized by the bytes read, not by encoded pixels
+REMUX_MB_PER_SECOND: float = getattr(settings, "VIDEO_REMUX_MB_PER_SECOND", 20.0)
+LOCK_TIMEOUT: Final[int] = MAX_JOB_TIMEOUT + 600
+
+ENCODE_TASKS: Final[set[str]] = {"create_variants", "encode_rendition"}
+TRAILER_MAX_SECONDS: Final[int] = getattr(settings, "VIDEO_TRAILER_MAX_SECONDS", 300)
+
+KEYFRAME_PROBE_SECONDS: Final[int] = 30
+THUMB_EXTRA_FORMATS: tuple[str, ...] = tuple(
+    getattr(settings, "VIDEO_THUMB_EXTRA_FORMATS", ())
+)
+
+TRICKPLAY_INTERVAL: int = getattr(settings, "VIDEO_TRICKPLAY_INTERVAL", 10)
+TRICKPLAY_WIDTH: int = getattr(settings, "VIDEO_TRICKPLAY_WIDTH", 160)
+TRICKPLAY_GRID: Final[tuple[int, int]] = (10, 10)
+TRICKPLAY_FORMAT: str = getattr(settings, "VIDEO_TRICKPLAY_FORMAT", "jpg")
+# Encoder quality per sprite format: JPEG qscale (lower is better) means
+# nothing to libwebp, which reads -q:v as quality 0–100
+TRICKPLAY_QUALITY: Final[dict[str, list[str]]] = {
+    "jpg": ["-q:v", "5"],
+    "webp": ["-quality", "75"],
+}
+
+X264_ARGS: Final[list[str]] = ["-c:v", "libx264", "-preset", "veryfast", "-crf", "23"]
+AAC_ARGS: Final[list[str]] = ["-c:a", "aac", "-b:a", "128k", "-ac", "2"]
+
+# A compliant source may exceed its rung's nominal bitrate by this factor
+# and still be stream-copied instead of re-encoded.
+REMUX_BITRATE_HEADROOM: float = getattr(settings, "VIDEO_REMUX_BITRATE_HEADROOM", 1.5)
+
+
+class PipelineCancelled(Exception):
+    """Raised inside a running task once its video has been deleted."""
+
+
+def pipeline_stage(
+    stage: str,
+    start: str | None = None,
+    done: str | None = None,
+    parallel: bool = False,
+):
+    """Record attempts and status transitions of a pipeline task.
+
+    The wrapped task's first argument must be the video id. Before it runs
+    the attempt counter for *stage* is bumped under a row lock (and the
+    status set to *start*); on success the status becomes *done*. Any
+    exception marks the video as failed at *stage* and is re-raised so RQ
+    can retry. *parallel* tasks (fan-out jobs of one video) never reset a
+    failure a sibling job recorded.
+
+    A task returns its successor from :func:`next_stage`; it is enqueued
+    only after *done* is written, so the next worker never loads the
+    status this stage is about to replace.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(video_id: int, *args, **kwargs):
+            with transaction.atomic():
+                vid = Video.objects.select_for_update().filter(pk=video_id).first()
+                if vid is None:
+                    print(f"⏭ Video {video_id} existiert nicht mehr – {stage} übersprungen.")
+                    return None
+                attempts = dict(vid.processing_attempts or {})
+                attempts[stage] = attempts.get(stage, 0) + 1
+                vid.processing_attempts = attempts
+                vid.processing_stage = stage
+                fields = ["processing_attempts", "processing_stage"]
+                if not (parallel and vid.processing_status == Video.Status.FAILED):
+                    vid.processing_error = ""
+                    fields.append("processing_error")
+                    if start:
+                        vid.processing_status = start
+                        fields.append("processing_status")
+                vid.save(update_fields=fields)
+
+            try:
+                result = func(video_id, *args, **kwargs)
+            except PipelineCancelled:
+                print(f"⏹ Video {video_id} gelöscht – {stage} abgebrochen.")
+                discard_outputs(video_id)
+                return None
+            except Exception as exc:
+                Video.objects.filter(pk=video_id).update(
+                    processing_status=Video.Status.FAILED,
+                    processing_error=f"{type(exc).__name__}: {exc}"[-2000:],
+                )
+                # probe_source may only just have hashed the upload
+                content_hash = Video.objects.filter(pk=video_id).values_list(
+                    "content_hash", flat=True,
+                ).first()
+                wake_twins(content_hash or "", exclude=video_id)
+                raise
+
+            if done:
+                # a task that set its own status (e.g. dedupe → ready) keeps it
+                Video.objects.filter(
+                    pk=video_id, processing_status=vid.processing_status,
+                ).update(processing_status=done)
+            if isinstance(result, functools.partial):
+                result()
+                return None
+            return result
+        return wrapper
+    return decorator
+
+
+def next_stage(func, video_id: int, *args, **kwargs) -> functools.partial:
+    """Successor a task returns to :func:`pipeline_stage` to be enqueued."""
+    return functools.partial(enqueue_stage, func, video_id, *args, **kwargs)
+
+
+def stage_job_id(video_id: int, key: str) -> str:
+    """Deterministic RQ job id of pipeline step *key* for *video_id*."""
+    return f"video-{video_id}-{key}"
+
+
+def cancel_key(video_id: int) -> str:
+    """Redis flag telling running tasks of *video_id* to stop."""
+    return f"videoflix:cancel:{video_id}"
+
+
+def jobs_key(video_id: int) -> str:
+    """Redis set of all job ids ever enqueued for *video_id*."""
+    return f"videoflix:jobs:{video_id}"
+
+
+def is_cancelled(video_id: int) -> bool:
+    """Whether *video_id* was deleted while its pipeline was in flight."""
+    return bool(get_connection().exists(cancel_key(video_id)))
+
+
+def cancel_pipeline(video_id: int) -> int:
+    """Stop all pipeline work of *video_id* and return the cancelled job count.
+
+    Waiting jobs are cancelled in RQ; running ones see the cancel flag and
+    terminate their FFmpeg process (see :func:`run`).
+    """
+    conn = get_connection()
+    conn.set(cancel_key(video_id), 1, ex=LOCK_TIMEOUT)
+
+    cancelled = 0
+    for raw in conn.smembers(jobs_key(video_id)):
+        job_id = raw.decode() if isinstance(raw, bytes) else raw
+        try:
+            job = Job.fetch(job_id, connection=conn)
+        except NoSuchJobError:
+            continue
+        status = job.get_status(refresh=False)
+        if status in ACTIVE_JOB_STATES and status != JobStatus.STARTED:
+            job.cancel()
+            cancelled += 1
+
+    conn.delete(jobs_key(video_id))
+    progress.clear(video_id)
+    return cancelled
+
+
+def discard_outputs(video_id: int) -> None:
+    """Remove everything the pipeline wrote for *video_id*."""
+    purge_paths([f"{name}/{video_id}" for name in ("videos", "thumbs", "hero")])
+
+
+def purge_later(paths: list[str]) -> None:
+    """Queue storage names *paths* for :func:`purge_media`.
+
+    Many deletions share one job: it is only enqueued when none is
+    waiting yet, the running one drains whatever arrives meanwhile.
+    """
+    if not paths:
+        return
+    conn = get_connection()
+    conn.rpush(PURGE_KEY, *paths)
+    if conn.set(PURGE_SCHEDULED_KEY, 1, nx=True, ex=MAX_JOB_TIMEOUT):
+        get_queue("maintenance").enqueue(purge_media)
+
+
+def purge_paths(paths: list[str]) -> int:
+    """Delete files and directories *paths* from the media storage."""
+    root = storage.scratch_root().resolve()
+    remote = storage.is_remote()
+    removed = 0
+    for rel in paths:
+        path = (root / rel).resolve()
+        if path == root or not path.is_relative_to(root):
+            continue
+        if path.is_dir():
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            path.unlink(missing_ok=True)
+        if remote:
+            storage.remove(path.relative_to(root).as_posix())
+        removed += 1
+    return removed
+
+
+def purge_media(batch_size: int = PURGE_BATCH) -> int:
+    """Drain the purge list in batches; returns the number of paths handled."""
+    conn = get_connection()
+    # cleared first: paths pushed from now on schedule the next job
+    conn.delete(PURGE_SCHEDULED_KEY)
+    removed = 0
+    while batch := conn.lpop(PURGE_KEY, batch_size):
+        removed += purge_paths(
+            [p.decode() if isinstance(p, bytes) else p for p in batch]
+        )
+    return removed
+
+
+def active_job(job_id: str) -> Job | None:
+    """Return the job *job_id* if it is still waiting or running.
+
+    A finished, failed or stopped job with that id is deleted so the id
+    can be reused.
+    """
+    try:
+        job = Job.fetch(job_id, connection=get_connection())
+    except NoSuchJobError:
+        return None
+    if job.get_status(refresh=False) in ACTIVE_JOB_STATES:
+        return job
+    job.delete()
+    return None
+
+
+def queue_for(func, video_id: int) -> str:
+    """Name of the RQ queue that runs task *func* for *video_id*.
+
+    Encodes go to ``trailer`` for trailers and short clips, otherwise to
+    ``feature``; all other (short-running) stages go to ``fast``.
+    """
+    if func.__name__ not in ENCODE_TASKS:
+        return "fast"
+    vid = Video.objects.filter(pk=video_id).only("is_trailer", "duration").first()
+    if vid and (vid.is_trailer or 0 < (vid.duration or 0) <= TRAILER_MAX_SECONDS):
+        return "trailer"
+    return "feature"
+
+
+def enqueue_stage(func, video_id: int, *args, job_key: str | None = None, **kwargs):
+    """Queue the pipeline task *func* with retry and exponential backoff.
+
+    Jobs get the id ``video-<id>-<job_key>`` (default: the task name); if
+    such a job is already queued, scheduled or running it is returned
+    instead of enqueueing a duplicate. The queue is picked by
+    :func:`queue_for`.
+    """
+    job_id = stage_job_id(video_id, job_key or func.__name__)
+    if is_cancelled(video_id):
+        return None
+    existing = active_job(job_id)
+    if existing is not None:
+        print(f"⏭ {job_id} läuft bereits – übersprungen.")
+        return existing
+
+    kwargs.setdefault("retry", STAGE_RETRY)
+    queue = get_queue(queue_for(func, video_id))
+    job = queue.enqueue(func, video_id, *args, job_id=job_id, **kwargs)
+    conn = get_connection()
+    conn.sadd(jobs_key(video_id), job_id)
+    conn.expire(jobs_key(video_id), LOCK_TIMEOUT)
+    return job
+
+
+@contextmanager
+def video_lock(
+    video_id: int, *names: str, timeout: int = LOCK_TIMEOUT,
+) -> Iterator[bool]:
+    """Hold Redis locks on outputs *names* of *video_id* across all nodes.
+
+    Yields ``False`` (holding nothing) if any lock is taken by another
+    worker. Locks expire after *timeout* seconds if a worker dies.
+    """
+    conn = get_connection()
+    held = []
+    try:
+        for name in names:
+            lock = conn.lock(f"videoflix:lock:{video_id}:{name}", timeout=timeout)
+            if not lock.acquire(blocking=False):
+                break
+            held.append(lock)
+        yield len(held) == len(names)
+    finally:
+        for lock in held:
+            try:
+                lock.release()
+            except LockError:  # expired meanwhile
+                pass
+
+
+def part_path(dst: Path) -> Path:
+    """Temporary sibling ffmpeg writes to before it is renamed to *dst*."""
+    return dst.with_name(f"{dst.stem}.part{dst.suffix}")
+
+
+def commit_parts(*dsts: Path) -> None:
+    """Atomically move finished :func:`part_path` files into place."""
+    for dst in dsts:
+        os.replace(part_path(dst), dst)
+
+
+def fresh_part_dir(final: Path) -> Path:
+    """Empty scratch directory that replaces *final* via :func:`commit_dir`."""
+    tmp = final.with_name(f"{final.name}.part")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    return tmp
+
+
+def commit_dir(final: Path) -> None:
+    """Swap the finished scratch directory of *final* into place."""
+    shutil.rmtree(final, ignore_errors=True)
+    os.replace(final.with_name(f"{final.name}.part"), final)
+
+
+def run(
+    cmd: list[str],
+    *,
+    video_id: int | None = None,
+    stage: str = "",
+    duration: float = 0.0,
+) -> None:
+    """Execute *cmd* via ``subprocess`` and abort on non‑zero exit.
+
+    FFmpeg's ``-progress`` output is read line by line; with a *video_id*
+    every snapshot is published to Redis under *stage*. Only the last
+    ``STDERR_TAIL_LINES`` lines of stderr are kept in memory.
+    """
+    if cmd[0] == FFMPEG:
+        cmd = [cmd[0], "-nostats", "-progress", "pipe:1", *cmd[1:]]
     print("▶", " ".join(cmd))
-    cp = subprocess.run(cmd, text=True, capture_output=True)
 
-    if cp.stdout:
-        print(cp.stdout)
-    if cp.stderr:
-        print(cp.stderr)
+    proc = subprocess.Popen(
+        cmd, text=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+    )
+    tail: deque[str] = deque(maxlen=STDERR_TAIL_LINES)
+    reader = threading.Thread(target=tail.extend, args=(proc.stderr,), daemon=True)
+    reader.start()
+
+    snapshot: dict[str, str] = {}
+    for line in proc.stdout:
+        key, _, value = line.strip().partition("=")
+        snapshot[key] = value
+        if key == "progress" and video_id is not None:
+            if is_cancelled(video_id):
+                proc.terminate()
+                proc.wait()
+                reader.join()
+                raise PipelineCancelled(f"Video {video_id} wurde gelöscht.")
+            progress.publish(video_id, stage, progress_snapshot(snapshot, duration))
+
+    proc.wait()
+    reader.join()
+
+    if proc.returncode:
+        print("".join(tail))
+        raise subprocess.CalledProcessError(proc.returncode, cmd, stderr="".join(tail))
+
+
+def progress_snapshot(raw: dict[str, str], duration: float) -> dict[str, float]:
+    """Turn one ffmpeg ``-progress`` block into percent, fps, speed and ETA."""
+    try:
+        done = int(raw.get("out_time_us") or 0) / 1_000_000
+    except ValueError:  # "N/A" before the first frame
+        done = 0.0
+    try:
+        speed = float(raw.get("speed", "0").rstrip("x"))
+    except ValueError:
+        speed = 0.0
+    try:
+        fps = float(raw.get("fps") or 0)
+    except ValueError:
+        fps = 0.0
+
+    finished = raw.get("progress") == "end"
+    percent = 100.0 if finished else min(done / duration * 100, 99.9) if duration else 0.0
+    eta = max(duration - done, 0) / speed if speed and not finished else 0.0
+
+    return {
+        "percent": round(percent, 1),
+        "fps": fps,
+        "speed": speed,
+        "eta": round(eta),
+    }
+
+
+def probe(src: Path | str) -> dict[str, object]:
+    """Return stream metadata of *src* from a single ffprobe call.
+
+    Besides format and stream details, packet flags of the first
+    ``KEYFRAME_PROBE_SECONDS`` are read to measure the keyframe interval
+    without decoding.
+    """
+    info = json.loads(subprocess.check_output([
+        FFPROBE, "-v", "error",
+        "-show_format", "-show_streams",
+        "-read_intervals", f"%+{KEYFRAME_PROBE_SECONDS}",
+        "-show_entries", "packet=stream_index,pts_time,flags",
+        "-of", "json", str(src),
+    ]))
+    streams = info.get("streams", [])
+    fmt = info.get("format", {})
+    video = next((s for s in streams if s.get("codec_type") == "video"), {})
+    audio = next((s for s in streams if s.get("codec_type") == "audio"), {})
+
+    num, _, den = video.get("avg_frame_rate", "0/1").partition("/")
+    fps = float(num) / float(den) if float(den or 0) else 0.0
+
+    keyframes = [
+        float(p["pts_time"])
+        for p in info.get("packets", [])
+        if p.get("stream_index") == video.get("index")
+        and "K" in p.get("flags", "")
+        and p.get("pts_time") not in (None, "N/A")
+    ]
+    gaps = [b - a for a, b in zip(keyframes, keyframes[1:])]
+
+    return {
+        "width": int(video.get("width", 0)),
+        "height": int(video.get("height", 0)),
+        "fps": round(fps, 3),
+        "bit_rate": int(video.get("bit_rate") or fmt.get("bit_rate") or 0),
+        "video_codec": video.get("codec_name"),
+        "video_profile": video.get("profile"),
+        "pix_fmt": video.get("pix_fmt"),
+        "keyframe_interval": round(sum(gaps) / len(gaps), 3) if gaps else None,
+        "audio_codec": audio.get("codec_name"),
+        "audio_channels": int(audio.get("channels", 0)),
+        "audio_layout": audio.get("channel_layout"),
+        "audio_sample_rate": int(audio.get("sample_rate", 0)),
+        "audio_bit_rate": int(audio.get("bit_rate", 0)),
+        "format_name": fmt.get("format_name", ""),
+        "duration": float(fmt.get("duration") or 0),
+    }
+
+
+def media_info(vid: Video) -> dict[str, object]:
+    """Return the stored probe of *vid*, probing the original only once."""
+    if not vid.media_info:
+        vid.media_info = probe(storage.input_path(vid.video_file.name))
+        vid.duration = vid.duration or round(vid.media_info["duration"]) or None
+        vid.save(update_fields=["media_info", "duration"])
+    return vid.media_info
+
+
+@pipeline_stage("probe", done=Video.Status.PROBED)
+def probe_source(video_id: int) -> functools.partial | None:
+    """First pipeline stage: persist source metadata, then transcode.
+
+    If the same content was uploaded before, its outputs are reused and
+    nothing is transcoded; a twin still in the pipeline shares its outputs
+    once it is ready (see :func:`share_with_twins`).
+    """
+    vid = Video.objects.get(pk=video_id)
+
+    if not vid.video_file:
+        raise FileNotFoundError("Original‑Upload fehlt – nichts zu tun.")
+
+    if not vid.content_hash:  # bulk-created rows skip the pre_save hash
+        vid.content_hash = file_digest(vid.video_file)
+        vid.save(update_fields=["content_hash"])
+
+    twin = find_twin(vid)
+    if twin is not None and twin.processing_status == Video.Status.READY:
+        adopt_outputs(vid, twin)
+        print(f"♻️ Video {video_id} ist identisch mit {twin.pk} – Ausgaben übernommen.")
+        return
+    if twin is not None:
+        vid.media_info = twin.media_info or vid.media_info
+        vid.processing_stage = DEDUPE_STAGE
+        vid.save(update_fields=["media_info", "processing_stage"])
+        print(f"⏳ Video {video_id} wartet auf identisches Video {twin.pk}.")
+        return
 
-    cp.check_returncode()
+    meta = media_info(vid)
+    return next_stage(
+        create_variants, video_id, **encode_job_kwargs(meta, build_ladder(meta)),
+    )
+
+
+def start_waiting_pipelines(
+    batch_size: int = ENQUEUE_BATCH,
+    pause: float = ENQUEUE_PAUSE,
+    report=None,
+) -> int:
+    """Enqueue the pipeline of every row waiting in ``INGEST_STAGE``.
+
+    Jobs are enqueued *batch_size* at a time with *pause* seconds in
+    between so bulk loads do not flood the queues; *report* receives a
+    progress line per batch. Returns the number of videos started.
+    """
+    ids = list(
+        Video.objects.filter(processing_stage=INGEST_STAGE)
+        .order_by("pk")
+        .values_list("pk", flat=True)
+    )
+    for start in range(0, len(ids), batch_size):
+        for video_id in ids[start:start + batch_size]:
+            enqueue_stage(probe_source, video_id)
+        if report:
+            report(f"  {min(start + batch_size, len(ids))}/{len(ids)} Pipelines eingereiht")
+        if start + batch_size < len(ids):
+            time.sleep(pause)
+    return len(ids)
+
+
+def schedule_waiting_pipelines():
+    """Run :func:`start_waiting_pipelines` once on the maintenance queue."""
+    job_id = "start-waiting-pipelines"
+    existing = active_job(job_id)
+    if existing is not None:
+        return existing
+    return get_queue("maintenance").enqueue(start_waiting_pipelines, job_id=job_id)
+
+
+def find_twin(vid: Video) -> Video | None:
+    """Another video with the same content whose outputs *vid* can reuse.
+
+    A ready twin wins; otherwise the oldest *older* one still in the
+    pipeline, so two copies probed at the same time never wait on each
+    other. Failed videos and videos waiting on a twin themselves are
+    ignored.
+    """
+    if not vid.content_hash:
+        return None
+    twins = (
+        Video.objects.filter(content_hash=vid.content_hash)
+        .exclude(pk=vid.pk)
+        .exclude(processing_status=Video.Status.FAILED)
+        .order_by("pk")
+    )
+    ready = twins.filter(processing_status=Video.Status.READY).first()
+    if ready is not None:
+        return ready
+    return twins.filter(pk__lt=vid.pk).exclude(processing_stage=DEDUPE_STAGE).first()
+
+
+def wake_twins(content_hash: str, exclude: int | None = None) -> int:
+    """Re-probe videos waiting on a twin with *content_hash*.
+
+    Called when that twin failed or was deleted: each waiter picks another
+    twin or encodes the content itself. Returns the number re-queued.
+    """
+    if not content_hash:
+        return 0
+    waiting = list(
+        Video.objects.filter(content_hash=content_hash, processing_stage=DEDUPE_STAGE)
+        .exclude(processing_status=Video.Status.READY)
+        .exclude(pk=exclude)
+        .order_by("pk")
+        .values_list("pk", flat=True)
+    )
+    for video_id in waiting:
+        enqueue_stage(probe_source, video_id)
+    return len(waiting)
+
+
+def adopt_outputs(vid: Video, twin: Video) -> None:
+    """Point *vid* at the renditions, thumbnails and metadata of *twin*."""
+    for field in DEDUPE_FIELDS:
+        setattr(vid, field, getattr(twin, field))
+    vid.duration = vid.duration or twin.duration
+    vid.processing_stage = DEDUPE_STAGE
+    vid.processing_status = Video.Status.READY
+    vid.save(update_fields=[
+        *DEDUPE_FIELDS, "duration", "processing_stage", "processing_status",
+    ])
+
+
+def share_with_twins(vid: Video) -> int:
+    """Hand the finished outputs of *vid* to videos waiting on it."""
+    waiting = Video.objects.filter(
+        content_hash=vid.content_hash, processing_stage=DEDUPE_STAGE,
+    ).exclude(pk=vid.pk).exclude(processing_status=Video.Status.READY)
+    count = 0
+    for twin in waiting:
+        adopt_outputs(twin, vid)
+        count += 1
+    return count
+
+
+def encode_work(
+    meta: dict[str, object],
+    rungs: list[tuple[str, int, str]],
+    copy_height: int | None = None,
+) -> float:
+    """Megapixels the encoder produces for *rungs* (the remuxed one is free)."""
+    width, height = meta.get("width") or 16, meta.get("height") or 9
+    frames = float(meta.get("duration") or 0) * float(meta.get("fps") or 25)
+    pixels = sum(
+        h * round(h * width / height) for _, h, _ in rungs if h != copy_height
+    )
+    return frames * pixels / 1_000_000
+
+
+def remux_seconds(meta: dict[str, object]) -> float:
+    """Seconds a stream copy of the whole source takes at ``REMUX_MB_PER_SECOND``."""
+    size = float(meta.get("duration") or 0) * int(meta.get("bit_rate") or 0) / 8
+    return size / (REMUX_MB_PER_SECOND * 1024**2)
+
+
+def copy_seconds(
+    meta: dict[str, object],
+    rungs: list[tuple[str, int, str]],
+    copy_height: int | None,
+) -> float:
+    """Stream-copy time within *rungs*: only if the remuxed rung is among them."""
+    if copy_height is None or copy_height not in {h for _, h, _ in rungs}:
+        return 0.0
+    return remux_seconds(meta)
+
+
+def encode_timeout(work: float, copy: float = 0.0) -> int:
+    """RQ timeout for *work* megapixels at the slowest measured worker.
+
+    *copy* adds the seconds of a stream copy (see :func:`remux_seconds`).
+    """
+    seconds = (work / estimates.speed(slowest=True) + copy) * TIMEOUT_FACTOR
+    return int(min(max(seconds, MIN_JOB_TIMEOUT), MAX_JOB_TIMEOUT))
+
+
+def encode_job_kwargs(
+    meta: dict[str, object], rungs: list[tuple[str, int, str]],
+) -> dict[str, object]:
+    """``job_timeout`` and estimated runtime (job meta) for encoding *rungs*."""
+    copy_height = remux_height(meta, build_ladder(meta))
+    work = encode_work(meta, rungs, copy_height)
+    copy = copy_seconds(meta, rungs, copy_height)
+    return {
+        "job_timeout": encode_timeout(work, copy),
+        "meta": {"estimate": round(work / estimates.speed() + copy)},
+    }
+
+
+def queue_eta(video_id: int) -> dict[str, object] | None:
+    """Estimate when the waiting encode job of *video_id* will be done.
+
+    Sums the estimated runtimes of the jobs ahead in its queue, divided by
+    the workers serving that queue, plus its own estimate. ``None`` if no
+    encode job of the video is waiting.
+    """
+    queue = get_queue(queue_for(create_variants, video_id))
+    ids = queue.get_job_ids()
+    job_id = stage_job_id(video_id, "create_variants")
+    if job_id not in ids:
+        return None
+
+    ahead = ids[: ids.index(job_id)]
+    jobs = [
+        job for job in Job.fetch_many(ahead + [job_id], connection=queue.connection)
+        if job is not None
+    ]
+    wait = sum(job.meta.get("estimate", 0) for job in jobs[:-1])
+    workers = max(1, Worker.count(queue=queue))
+    return {
+        "queue": queue.name,
+        "ahead": len(ahead),
+        "seconds": round(wait / workers + jobs[-1].meta.get("estimate", 0)),
+    }
 
 
+def build_ladder(meta: dict[str, object]) -> list[tuple[str, int, str]]:
+    """Derive the rendition ladder for a probed source.
+
+    Heights above the source are skipped and bitrates are capped at the
+    source bitrate. A source smaller than every rung gets one rendition
+    at its own height.
+    """
+    src_height = int(meta.get("height") or 0)
+    src_kbps = int(meta.get("bit_rate") or 0) // 1000
+
+    def cap(br: str) -> str:
+        kbps = int(br.rstrip("k"))
+        return f"{min(kbps, src_kbps) if src_kbps else kbps}k"
+
+    if not src_height:
+        return list(RENDITIONS)
+
+    ladder = [(tag, h, cap(br)) for tag, h, br in RENDITIONS if h <= src_height]
+    if not ladder:
+        ladder = [(f"{src_height}p", src_height, cap(RENDITIONS[-1][2]))]
+    return ladder
+
+
+def remux_height(meta: dict[str, object], ladder: list[tuple[str, int, str]]) -> int | None:
+    """Return the ladder height *meta* can be stream-copied into, if any.
+
+    The source must be H.264 4:2:0 with AAC (or no) stereo audio in an
+    MP4/MOV container, sit exactly on a ladder height and stay within
+    the rung's nominal bitrate plus headroom. Its measured keyframe
+    interval must not exceed ``HLS_SEGMENT_SECONDS``: the copied rung keeps
+    the source GOP, and HLS segments can only be cut at keyframes.
+    """
+    if meta.get("video_codec") != "h264" or meta.get("pix_fmt") != "yuv420p":
+        return None
+    if meta.get("audio_codec") not in ("aac", None) or int(meta.get("audio_channels") or 0) > 2:
+        return None
+    if "mp4" not in str(meta.get("format_name", "")).split(","):
+        return None
+    gop = meta.get("keyframe_interval")
+    if not gop or float(gop) > HLS_SEGMENT_SECONDS:
+        return None
+
+    nominal = {h: int(br.rstrip("k")) for _, h, br in RENDITIONS}
+    height = int(meta.get("height") or 0)
+    kbps = int(meta.get("bit_rate") or 0) // 1000
+
+    if height not in {h for _, h, _ in ladder}:
+        return None
+    if kbps > nominal.get(height, kbps) * REMUX_BITRATE_HEADROOM:
+        return None
+    return height
+
+
+def remux_cmd(src: Path | str, dst: Path) -> list[str]:
+    """Copy the first video/audio stream of *src* into a faststart MP4."""
+    return [
+        FFMPEG, "-y", "-i", str(src),
+        "-map", "0:v:0", "-map", "0:a:0?",
+        "-c", "copy",
+        "-movflags", "+faststart",
+        str(dst),
+    ]
+
+
+def rate_args(bitrate: str, fps: float, spec: str = "") -> list[str]:
+    """Bitrate cap and keyframe interval for the output stream *spec*."""
+    kbps = int(bitrate.rstrip("k"))
+    args = [f"-maxrate{spec}", bitrate, f"-bufsize{spec}", f"{kbps * 2}k"]
+    if fps:
+        args += [f"-g{spec}", str(round(fps * 2))]
+    return args
+
+
+def rendition_cmd(
+    src: Path | str, dst: Path, height: int, bitrate: str, fps: float = 0.0,
+) -> list[str]:
+    """Build the ffmpeg command for a single rendition."""
+    return [
+        FFMPEG, "-y", "-i", str(src),
+        "-vf", f"scale=-2:{height}",
+        *X264_ARGS,
+        *rate_args(bitrate, fps),
+        *AAC_ARGS,
+        "-movflags", "+faststart",
+        str(dst),
+    ]
+
+
+def ladder_cmd(
+    src: Path | str, outputs: list[tuple[Path, int, str]], fps: float = 0.0,
+) -> list[str]:
+    """Build one ffmpeg command that decodes *src* once for all *outputs*.
+
+    The decoded video is split and scaled per rendition; audio is encoded
+    a single time and shared between all MP4 files through the tee muxer.
+    """
+    labels = "".join(f"[s{i}]" for i in range(len(outputs)))
+    graph = ";".join([
+        f"[0:v]split={len(outputs)}{labels}",
+        *(f"[s{i}]scale=-2:{h}[v{i}]" for i, (_, h, _) in enumerate(outputs)),
+    ])
+
+    maps: list[str] = []
+    rates: list[str] = []
+    for i, (_, _, bitrate) in enumerate(outputs):
+        maps += ["-map", f"[v{i}]"]
+        rates += rate_args(bitrate, fps, f":v:{i}")
+    maps += ["-map", "0:a:0?"]
+
+    # no shell in between: the quotes around the comma are escaped for
+    # ffmpeg's own option parser, which otherwise splits at the comma
+    slaves = "|".join(
+        f"[f=mp4:movflags=+faststart:select=\\'v:{i},a\\']{dst}"
+        for i, (dst, _, _) in enumerate(outputs)
+    )
+    return [
+        FFMPEG, "-y", "-i", str(src),
+        "-filter_complex", graph,
+        *maps,
+        *X264_ARGS,
+        *rates,
+        *AAC_ARGS,
+        "-flags", "+global_header",
+        "-f", "tee", slaves,
+    ]
+
+
+def available_cpus() -> int:
+    """CPUs this worker may use: CPU affinity, capped by a cgroup v2 quota.
+
+    ``os.cpu_count()`` reports every host core, also inside a container
+    limited with ``cpus:``.
+    """
+    if hasattr(os, "sched_getaffinity"):
+        cpus = len(os.sched_getaffinity(0))
+    else:
+        cpus = os.cpu_count() or 1
+    try:
+        quota, period = CGROUP_CPU_MAX.read_text().split()
+    except (OSError, ValueError):
+        return cpus
+    if quota == "max":
+        return cpus
+    return max(1, min(cpus, math.ceil(int(quota) / int(period))))
+
+
+def chunk_count(duration: float, workers: int | None = None) -> int:
+    """Chunks for *duration* s: one per worker, each ≥ ``CHUNK_MIN_SECONDS``."""
+    workers = workers or CHUNK_WORKERS or available_cpus()
+    return max(1, min(workers, int(duration // CHUNK_MIN_SECONDS)))
+
+
+def split_cmd(src: Path, pattern: Path, seconds: int) -> list[str]:
+    """Cut the video stream of *src* into keyframe-aligned chunks."""
+    return [
+        FFMPEG, "-y", "-i", str(src),
+        "-map", "0:v:0", "-c", "copy",
+        "-f", "segment",
+        "-segment_time", str(seconds),
+        "-reset_timestamps", "1",
+        str(pattern),
+    ]
+
+
+def concat_cmd(listing: Path, src: Path | str, dst: Path) -> list[str]:
+    """Join encoded chunks losslessly and add the source audio once."""
+    return [
+        FFMPEG, "-y",
+        "-f", "concat", "-safe", "0", "-i", str(listing),
+        "-i", str(src),
+        "-map", "0:v:0", "-map", "1:a:0?",
+        "-c:v", "copy",
+        *AAC_ARGS,
+        "-movflags", "+faststart",
+        str(dst),
+    ]
+
+
+def encode_chunked(
+    src: Path | str,
+    outputs: list[tuple[Path, int, str]],
+    fps: float,
+    duration: float,
+    chunks: int,
+    work_dir: Path,
+    video_id: int | None = None,
+) -> None:
+    """Encode *outputs* by splitting *src* at keyframes into *chunks* parts.
+
+    Each chunk is decoded once for the whole ladder; chunk encodes run as
+    parallel ffmpeg processes and are concatenated per rendition without
+    re-encoding. Audio is encoded once from the source during the join.
+    """
+    shutil.rmtree(work_dir, ignore_errors=True)
+    work_dir.mkdir(parents=True)
+    try:
+        seconds = math.ceil(duration / chunks)
+        run(split_cmd(src, work_dir / "src_%04d.mp4", seconds))
+        parts = sorted(work_dir.glob("src_*.mp4"))
+
+        def encode_part(part: Path) -> None:
+            chunk_outputs = [
+                (work_dir / f"{part.stem}_{h}.mp4", h, br) for _, h, br in outputs
+            ]
+            run(
+                ladder_cmd(part, chunk_outputs, fps),
+                video_id=video_id, stage=part.stem, duration=seconds,
+            )
+
+        with ThreadPoolExecutor(max_workers=chunks) as pool:
+            list(pool.map(encode_part, parts))
+
+        for dst, height, _ in outputs:
+            listing = work_dir / f"{height}.txt"
+            listing.write_text("".join(
+                f"file '{work_dir / f'{p.stem}_{height}.mp4'}'\n" for p in parts
+            ))
+            run(concat_cmd(listing, src, dst))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def rendition_path(name: str, video_id: int, tag: str) -> Path:
+    """Local path of the *tag* rendition of *video_id* (original *name*)."""
+    return storage.local_path("videos", str(video_id), f"{Path(name).stem}_{tag}.mp4")
+
+
+@pipeline_stage("encode", start=Video.Status.ENCODING)
 def create_variants(video_id: int) -> None:
-    """Generate H.264 MP4 renditions for the given *video_id*."""
+    """Generate H.264 MP4 renditions for the given *video_id*.
+
+    In ``fanout`` mode every missing rendition becomes its own RQ job and
+    :func:`finalize_variants` runs once all of them have succeeded.
+    Renditions are written to ``*.part.mp4`` and renamed when complete, so
+    an existing file is always a finished encode.
+    """
     vid = Video.objects.get(pk=video_id)
 
     if not vid.video_file:
         raise FileNotFoundError("Original‑Upload fehlt – nichts zu tun.")
 
-    src = Path(vid.video_file.path)
-    out_dir = Path(settings.MEDIA_ROOT, "videos", str(video_id))
-    out_dir.mkdir(parents=True, exist_ok=True)
+    name = vid.video_file.name
+    src = storage.input_path(name)
+    storage.local_path("videos", str(video_id)).mkdir(parents=True, exist_ok=True)
 
-    variants: dict[int, str] = {}
+    meta = media_info(vid)
+    ladder = build_ladder(meta)
+    fps = float(meta.get("fps") or 0)
+    copy_height = remux_height(meta, ladder)
 
-    for tag, height, br in RENDITIONS:
-        dst = out_dir / f"{src.stem}_{tag}.mp4"
+    pending = [
+        (tag, height, br)
+        for tag, height, br in ladder
+        if not storage.exists(rendition_path(name, video_id, tag))
+    ]
+
+    duration = float(meta.get("duration") or 0)
+
+    if pending and TRANSCODE_MODE == "fanout":
+        jobs = [
+            enqueue_stage(
+                encode_rendition, video_id, tag, height, br, fps,
+                height == copy_height, duration,
+                job_key=f"encode-{tag}", **encode_job_kwargs(meta, [(tag, height, br)]),
+            )
+            for tag, height, br in pending
+        ]
+        enqueue_stage(finalize_variants, video_id, ladder, depends_on=jobs)
+        return
+
+    work = encode_work(meta, pending, copy_height)
+    lock_timeout = encode_timeout(work, copy_seconds(meta, pending, copy_height)) + 60
+    with video_lock(video_id, *(tag for tag, _, _ in pending), timeout=lock_timeout) as locked:
+        if not locked:
+            print(f"⏭ Video {video_id} wird bereits transkodiert – übersprungen.")
+            return
+        started = time.monotonic()
+        encode_pending(video_id, src, name, pending, copy_height, fps, duration)
+        estimates.record(work, time.monotonic() - started)
+
+    finalize_variants(video_id, ladder)
+
+
+def encode_pending(
+    video_id: int,
+    src: Path | str,
+    name: str,
+    pending: list[tuple[str, int, str]],
+    copy_height: int | None,
+    fps: float,
+    duration: float,
+) -> None:
+    """Produce the *pending* renditions of the original *name* (read from *src*)."""
+    out_dir = storage.local_path("videos", str(video_id))
+
+    for tag, height, _ in pending:
+        if height == copy_height:
+            dst = rendition_path(name, video_id, tag)
+            run(
+                remux_cmd(src, part_path(dst)),
+                video_id=video_id, stage=tag, duration=duration,
+            )
+            commit_parts(dst)
+            storage.publish(dst)
+    encode = [
+        (rendition_path(name, video_id, tag), height, br)
+        for tag, height, br in pending
+        if height != copy_height
+    ]
+    parts = [(part_path(dst), height, br) for dst, height, br in encode]
+
+    chunks = chunk_count(duration) if TRANSCODE_MODE == "chunked" else 1
+
+    if encode and chunks > 1:
+        encode_chunked(
+            src, parts, fps, duration, chunks, out_dir / "chunks", video_id,
+        )
+        commit_parts(*(dst for dst, _, _ in encode))
+        storage.publish(*(dst for dst, _, _ in encode))
+    elif encode and TRANSCODE_MODE in ("single", "chunked"):
+        run(
+            ladder_cmd(src, parts, fps),
+            video_id=video_id, stage="ladder", duration=duration,
+        )
+        commit_parts(*(dst for dst, _, _ in encode))
+        storage.publish(*(dst for dst, _, _ in encode))
+    else:
+        for dst, height, br in encode:
+            run(
+                rendition_cmd(src, part_path(dst), height, br, fps),
+                video_id=video_id, stage=f"{height}p", duration=duration,
+            )
+            commit_parts(dst)
+            storage.publish(dst)
+
+
+@pipeline_stage("encode", start=Video.Status.ENCODING, parallel=True)
+def encode_rendition(
+    video_id: int,
+    tag: str,
+    height: int,
+    bitrate: str,
+    fps: float,
+    remux: bool,
+    duration: float = 0.0,
+) -> None:
+    """Produce one rendition of *video_id* (fan-out worker job)."""
+    vid = Video.objects.get(pk=video_id)
+    src = storage.input_path(vid.video_file.name)
+    dst = rendition_path(vid.video_file.name, video_id, tag)
+
+    if storage.exists(dst):
+        return
+    meta = media_info(vid)
+    work = 0.0 if remux else encode_work(meta, [(tag, height, bitrate)])
+    copy = remux_seconds(meta) if remux else 0.0
+    with video_lock(video_id, tag, timeout=encode_timeout(work, copy) + 60) as locked:
+        if not locked:
+            print(f"⏭ {tag} von Video {video_id} läuft bereits – übersprungen.")
+            return
+        started = time.monotonic()
+        tmp = part_path(dst)
+        run(
+            remux_cmd(src, tmp) if remux else rendition_cmd(src, tmp, height, bitrate, fps),
+            video_id=video_id, stage=tag, duration=duration,
+        )
+        commit_parts(dst)
+        storage.publish(dst)
+        estimates.record(work, time.monotonic() - started)
 
-        if dst.exists():
-            variants[height] = dst.relative_to(settings.MEDIA_ROOT).as_posix()
-            continue
 
-        run([
-            FFMPEG, "-y", "-i", str(src),
-            "-vf", f"scale=-2:{height}",
-            "-c:v", "libx264", "-preset", "veryfast", "-crf", "23",
-            "-c:a", "aac", "-b:a", "128k", "-ac", "2",
-            "-movflags", "+faststart",
-            str(dst),
-        ])
-        variants[height] = dst.relative_to(settings.MEDIA_ROOT).as_posix()
-
-    if not variants:
+@pipeline_stage("finalize", start=Video.Status.ENCODING)
+def finalize_variants(
+    video_id: int, ladder: list[tuple[str, int, str]],
+) -> functools.partial:
+    """Record the finished ladder on the video and queue HLS packaging.
+
+    Runs once every rendition job succeeded, so a failure recorded by an
+    earlier attempt of one of them is cleared again.
+    """
+    vid = Video.objects.get(pk=video_id)
+
+    variants: dict[int, str] = {}
+    for tag, height, _ in ladder:
+        dst = rendition_path(vid.video_file.name, video_id, tag)
+        if storage.exists(dst):
+            variants[height] = storage.name_of(dst)
+
+    if not variants or len(variants) < len(ladder):
         raise RuntimeError("Keine Renditionen erzeugt – FFmpeg fehlgeschlagen?")
 
-    preferred = 720 if 720 in variants else max(variants)
+    top = max(variants)
+    preferred = 720 if 720 in variants else top
     vid.source_url = variants[preferred]
     vid.source_variants = [
-        {"path": variants[h], "height": h} for h in sorted(variants, reverse=True)
+        {
+            "path": variants[h],
+            "height": h,
+            "bitrate": br,
+            "top": h == top,
+        }
+        for _, h, br in ladder
     ]
     vid.save(update_fields=["source_url", "source_variants"])
 
-    #enqueue(extract_thumb, video_id, str(src))
-    preferred_abs = Path(settings.MEDIA_ROOT, variants[preferred])
-    enqueue(extract_thumb, video_id, str(preferred_abs))
+    return next_stage(package_hls, video_id)
+
+
+def hls_cmd(renditions: list[tuple[Path | str, Path]]) -> list[str]:
+    """Build one ffmpeg command that repackages MP4 files as fMP4 HLS.
+
+    *renditions* holds ``(mp4, playlist)`` pairs; streams are copied, so
+    packaging costs I/O only.
+    """
+    cmd = [FFMPEG, "-y"]
+    for mp4, _ in renditions:
+        cmd += ["-i", str(mp4)]
+
+    for i, (_, playlist) in enumerate(renditions):
+        cmd += [
+            "-map", f"{i}:v:0", "-map", f"{i}:a:0?",
+            "-c", "copy",
+            "-f", "hls",
+            "-hls_time", str(HLS_SEGMENT_SECONDS),
+            "-hls_playlist_type", "vod",
+            "-hls_segment_type", "fmp4",
+            "-hls_flags", "independent_segments",
+            "-hls_fmp4_init_filename", "init.mp4",
+            "-hls_segment_filename", str(playlist.parent / "seg_%05d.m4s"),
+            str(playlist),
+        ]
+    return cmd
+
+
+def playlist_bandwidth(playlist: Path) -> tuple[int, int]:
+    """Return peak and average bits per second of a media playlist."""
+    peak = total_bits = total_secs = 0.0
+    duration: float | None = None
+
+    for line in playlist.read_text().splitlines():
+        if line.startswith("#EXTINF:"):
+            duration = float(line[8:].split(",", 1)[0])
+        elif line and not line.startswith("#") and duration:
+            bits = (playlist.parent / line).stat().st_size * 8
+            peak = max(peak, bits / duration)
+            total_bits += bits
+            total_secs += duration
+            duration = None
+
+    average = total_bits / total_secs if total_secs else 0
+    return round(peak), round(average)
+
+
+def stream_codecs(path: Path | str) -> tuple[int, int, str]:
+    """Return width, height and the RFC 6381 ``CODECS`` string of *path*."""
+    info = json.loads(subprocess.check_output([
+        FFPROBE, "-v", "error",
+        "-show_entries", "stream=codec_type,codec_name,profile,level,width,height",
+        "-of", "json", str(path),
+    ]))
+    width = height = 0
+    codecs: list[str] = []
+
+    for stream in info.get("streams", []):
+        if stream.get("codec_type") == "video":
+            width, height = stream.get("width", 0), stream.get("height", 0)
+            profile = H264_PROFILES.get(stream.get("profile", ""), "4d00")
+            codecs.append(f"avc1.{profile}{int(stream.get('level', 31)):02x}")
+        elif stream.get("codec_type") == "audio":
+            codecs.append("mp4a.40.2")
+
+    return width, height, ",".join(codecs)
+
+
+@pipeline_stage("package", done=Video.Status.PACKAGED)
+def package_hls(video_id: int) -> functools.partial:
+    """Package the MP4 renditions of *video_id* as CMAF segments + HLS."""
+    vid = Video.objects.get(pk=video_id)
+
+    if not vid.source_variants:
+        raise RuntimeError("Keine Renditionen vorhanden – HLS nicht möglich.")
+
+    final_dir = storage.local_path("videos", str(video_id), "hls")
+    hls_dir = fresh_part_dir(final_dir)
+    renditions: list[tuple[str, Path]] = []
+
+    for variant in sorted(vid.source_variants, key=lambda v: v["height"], reverse=True):
+        playlist = hls_dir / f"{variant['height']}p" / "index.m3u8"
+        playlist.parent.mkdir(parents=True, exist_ok=True)
+        renditions.append((storage.input_path(variant["path"]), playlist))
+
+    run(hls_cmd(renditions), video_id=video_id, stage="hls", duration=vid.duration or 0)
+
+    lines = ["#EXTM3U", "#EXT-X-VERSION:7", "#EXT-X-INDEPENDENT-SEGMENTS"]
+    for mp4, playlist in renditions:
+        peak, average = playlist_bandwidth(playlist)
+        width, height, codecs = stream_codecs(mp4)
+        lines.append(
+            f"#EXT-X-STREAM-INF:BANDWIDTH={peak},AVERAGE-BANDWIDTH={average},"
+            f'RESOLUTION={width}x{height},CODECS="{codecs}"'
+        )
+        lines.append(playlist.relative_to(hls_dir).as_posix())
+
+    (hls_dir / "master.m3u8").write_text("\n".join(lines) + "\n")
+    commit_dir(final_dir)
+
+    master = final_dir / "master.m3u8"
+    vid.hls_playlist = storage.name_of(master)
+    storage.publish(final_dir)
+    vid.save(update_fields=["hls_playlist"])
+
+    return next_stage(extract_thumb, video_id)
+
+
+def thumb_cmd(src: str, ts: float, outputs: list[tuple[Path, int]]) -> list[str]:
+    """Build one ffmpeg command that writes every still from a single frame.
 
+    ``-ss`` is placed before ``-i`` so ffmpeg seeks to the nearest keyframe
+    instead of decoding the file up to *ts*.
+    """
+    labels = "".join(f"[s{i}]" for i in range(len(outputs)))
+    graph = ";".join([
+        f"[0:v]split={len(outputs)}{labels}",
+        *(f"[s{i}]scale={w}:-2[o{i}]" for i, (_, w) in enumerate(outputs)),
+    ])
+    cmd = [FFMPEG, "-y", "-ss", str(ts), "-i", src, "-filter_complex", graph]
+    for i, (dst, _) in enumerate(outputs):
+        cmd += ["-map", f"[o{i}]", "-frames:v", "1", "-update", "1", str(dst)]
+    return cmd
 
 
-def extract_thumb(video_id: int, src_path: str) -> None:
-    """Grab 1280 px hero‐frame + 320 px thumbnail and set duration."""
+@pipeline_stage("thumbnail", done=Video.Status.THUMBNAILED)
+def extract_thumb(video_id: int, src_path: str | None = None) -> functools.partial:
+    """Grab 1280 px hero‐frame + 320 px thumbnail and set duration.
+
+    *src_path* defaults to the preferred rendition. Formats listed in
+    ``VIDEO_THUMB_EXTRA_FORMATS`` (e.g. ``webp``, ``avif``) are written
+    next to both images in the same ffmpeg call.
+    """
     vid = Video.objects.get(pk=video_id)
+    src_path = src_path or storage.input_path(vid.source_url)
 
-    hero_dir = Path(settings.MEDIA_ROOT, "hero", str(video_id))
-    thumb_dir = Path(settings.MEDIA_ROOT, "thumbs", str(video_id))
+    hero_dir = storage.local_path("hero", str(video_id))
+    thumb_dir = storage.local_path("thumbs", str(video_id))
     hero_dir.mkdir(parents=True, exist_ok=True)
     thumb_dir.mkdir(parents=True, exist_ok=True)
 
     hero = hero_dir / "hero.jpg"
     thumb = thumb_dir / "thumb.png"
 
-    dur = float(subprocess.check_output([
-        FFPROBE, "-v", "error", "-select_streams", "v:0",
-        "-show_entries", "format=duration",
-        "-of", "default=nokey=1:noprint_wrappers=1",
-        src_path,
-    ]))
-    #ts = max(dur * 0.25, 1)
+    dur = float(media_info(vid)["duration"])
     ts = min(max(10.0, 1.0), max(dur - 1.0, 1.0))
 
-    if not hero.exists():
-        run([
-          #  FFMPEG, "-y", "-ss", str(ts), "-i", src_path,
-            FFMPEG, "-y", "-i", src_path, "-ss", str(ts),
-
-            "-vframes", "1", "-vf", "scale=1280:-1",
-            str(hero),
-        ])
-
-    if not thumb.exists():
-        run([
-           # FFMPEG, "-y", "-ss", str(ts), "-i", src_path,
-            FFMPEG, "-y", "-i", src_path, "-ss", str(ts),
+    outputs = [(hero, 1280), (thumb, 320)]
+    for ext in THUMB_EXTRA_FORMATS:
+        outputs += [(hero.with_suffix(f".{ext}"), 1280), (thumb.with_suffix(f".{ext}"), 320)]
+    missing = [(dst, width) for dst, width in outputs if not storage.exists(dst)]
 
-            "-vframes", "1", "-vf", "scale=320:-1",
-            str(thumb),
-        ])
+    if missing:
+        run(thumb_cmd(src_path, ts, [(part_path(dst), w) for dst, w in missing]))
+        commit_parts(*(dst for dst, _ in missing))
+        storage.publish(*(dst for dst, _ in missing))
 
-    vid.hero_frame = hero.relative_to(settings.MEDIA_ROOT).as_posix()
-    vid.thumb = thumb.relative_to(settings.MEDIA_ROOT).as_posix()
+    vid.hero_frame = storage.name_of(hero)
+    vid.thumb = storage.name_of(thumb)
 
     if not vid.duration:
         vid.duration = round(dur)
@@ -130,3 +1324,126 @@ def extract_thumb(video_id: int, src_path: str) -> None:
     vid.save(update_fields=["hero_frame", "thumb", "duration"])
 
     print("Variants:", json.dumps(vid.source_variants, indent=2))
+    return next_stage(build_trickplay, video_id)
+
+
+def trickplay_vtt(duration: float, tile: tuple[int, int], sprite: str) -> str:
+    """WebVTT cues mapping each interval to its tile in the sprite sheets.
+
+    *sprite* is a ``%03d`` file name pattern, numbered from 1 like ffmpeg.
+    """
+    cols, rows = TRICKPLAY_GRID
+    width, height = tile
+    lines = ["WEBVTT", ""]
+
+    for i in range(math.ceil(duration / TRICKPLAY_INTERVAL)):
+        sheet, pos = divmod(i, cols * rows)
+        start = i * TRICKPLAY_INTERVAL
+        end = min(start + TRICKPLAY_INTERVAL, duration)
+        x, y = (pos % cols) * width, (pos // cols) * height
+        lines += [
+            f"{vtt_time(start)} --> {vtt_time(end)}",
+            f"{sprite % (sheet + 1)}#xywh={x},{y},{width},{height}",
+            "",
+        ]
+    return "\n".join(lines)
+
+
+def vtt_time(seconds: float) -> str:
+    """Format *seconds* as a WebVTT timestamp (``HH:MM:SS.mmm``)."""
+    hours, rest = divmod(round(seconds * 1000), 3_600_000)
+    minutes, rest = divmod(rest, 60_000)
+    secs, ms = divmod(rest, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}.{ms:03d}"
+
+
+@pipeline_stage("trickplay", done=Video.Status.READY)
+def build_trickplay(video_id: int) -> None:
+    """Render seek-preview sprite sheets plus a WebVTT index in one pass.
+
+    The smallest rendition is sampled every ``TRICKPLAY_INTERVAL`` seconds.
+    When the source has a keyframe at least that often, only keyframes are
+    decoded.
+    """
+    vid = Video.objects.get(pk=video_id)
+    info = media_info(vid)
+
+    if not vid.source_variants:
+        raise RuntimeError("Keine Renditionen vorhanden – Trickplay nicht möglich.")
+
+    smallest = min(vid.source_variants, key=lambda v: v["height"])
+    src = storage.input_path(smallest["path"])
+    final_dir = storage.local_path("videos", str(video_id), "trickplay")
+    out_dir = fresh_part_dir(final_dir)
+
+    aspect = int(info["height"]) / int(info["width"])
+    tile = (TRICKPLAY_WIDTH, round(TRICKPLAY_WIDTH * aspect / 2) * 2)
+    sprite = f"sprite_%03d.{TRICKPLAY_FORMAT}"
+
+    gop = info.get("keyframe_interval")
+    skip = ["-skip_frame", "nokey"] if gop and gop <= TRICKPLAY_INTERVAL else []
+    cols, rows = TRICKPLAY_GRID
+
+    run([
+        FFMPEG, "-y", *skip, "-i", str(src),
+        "-an",
+        "-vf", f"fps=1/{TRICKPLAY_INTERVAL},scale={tile[0]}:{tile[1]},tile={cols}x{rows}",
+        *TRICKPLAY_QUALITY.get(TRICKPLAY_FORMAT, []),
+        str(out_dir / sprite),
+    ])
+
+    (out_dir / "thumbs.vtt").write_text(
+        trickplay_vtt(float(info["duration"]), tile, sprite)
+    )
+    commit_dir(final_dir)
+
+    vtt = final_dir / "thumbs.vtt"
+    vid.trickplay_vtt = storage.name_of(vtt)
+    storage.publish(final_dir)
+    vid.save(update_fields=["trickplay_vtt"])
+
+    if vid.content_hash:
+        share_with_twins(vid)
+
+
+RESUME_STAGES: Final[dict[str, str]] = {
+    Video.Status.PENDING: "probe",
+    Video.Status.PROBED: "encode",
+    Video.Status.ENCODING: "encode",
+    Video.Status.PACKAGED: "thumbnail",
+    Video.Status.THUMBNAILED: "trickplay",
+}
+
+
+def resume_pipeline(video_id: int) -> str | None:
+    """Re-queue *video_id* from the stage it stopped or failed at.
+
+    Finished outputs are skipped by the stages themselves, so only the
+    missing work is redone. Returns the resumed stage, if any.
+    """
+    vid = Video.objects.get(pk=video_id)
+    if not vid.video_file:
+        return None
+
+    if vid.processing_stage == DEDUPE_STAGE and vid.processing_status != Video.Status.READY:
+        stage = "probe"  # re-check whether the twin finished or failed
+    elif vid.processing_status == Video.Status.FAILED:
+        stage = vid.processing_stage or "probe"
+    else:
+        stage = RESUME_STAGES.get(vid.processing_status)
+    if stage is None:
+        return None
+
+    funcs = {
+        "probe": probe_source,
+        "encode": create_variants,
+        "finalize": create_variants,
+        "package": package_hls,
+        "thumbnail": extract_thumb,
+        "trickplay": build_trickplay,
+    }
+    kwargs = {}
+    if funcs[stage] is create_variants and vid.media_info:
+        kwargs = encode_job_kwargs(vid.media_info, build_ladder(vid.media_info))
+    enqueue_stage(funcs[stage], video_id, **kwargs)
+    return stage
@@ -0,0 +1,130 @@
+"""Upload handler writing originals straight to their final location."""
+
+from __future__ import annotations
+
+import shutil
+import uuid
+from pathlib import Path, PurePath
+
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import (
+    FileUploadHandler,
+    SkipFile,
+    StopFutureHandlers,
+)
+from django.utils.text import get_valid_filename
+
+from . import storage
+from .hashing import new_hasher
+
+__all__ = [
+    "sniff_container",
+    "StreamedVideoFile",
+    "VideoUploadHandler",
+]
+
+# ISO-BMFF (mp4/mov/m4v) files start with a box of one of these types
+MP4_BOXES: tuple[bytes, ...] = (b"ftyp", b"moov", b"mdat", b"free", b"wide", b"skip")
+EBML_MAGIC: bytes = b"\x1a\x45\xdf\xa3"  # Matroska / WebM
+
+
+def sniff_container(head: bytes) -> str | None:
+    """Return ``"mp4"`` or ``"matroska"`` for a known video header, else ``None``."""
+    if head[4:8] in MP4_BOXES:
+        return "mp4"
+    if head.startswith(EBML_MAGIC):
+        return "matroska"
+    return None
+
+
+class StreamedVideoFile(UploadedFile):
+    """An original already written to local storage by the upload handler."""
+
+    def __init__(self, path: Path, relative_name: str, size: int, content_hash: str, **kwargs):
+        super().__init__(open(path, "rb"), name=path.name, size=size, **kwargs)
+        self.path = path
+        self.relative_name = relative_name
+        self.content_hash = content_hash
+
+    def temporary_file_path(self) -> str:
+        """Let storages move (not copy) the file if it is saved regularly."""
+        return str(self.path)
+
+    def publish(self) -> dict[str, str]:
+        """Upload the file if storage is remote; return the model fields for it."""
+        storage.publish(self.path.parent)
+        return {"video_file": self.relative_name, "content_hash": self.content_hash}
+
+
+class VideoUploadHandler(FileUploadHandler):
+    """Stream the ``video_file`` field to ``videos/uploads/<uuid>/``.
+
+    The data is hashed while it is written and the first chunk is sniffed:
+    anything that is not an MP4/QuickTime or Matroska container is skipped
+    before a byte reaches the disk. The API view and the admin assign
+    :attr:`StreamedVideoFile.relative_name` to the model, so the file is
+    written exactly once.
+    """
+
+    field_name_to_handle: str = "video_file"
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.active = False
+        self.rejected: str | None = None
+        self.path: Path | None = None
+
+    def new_file(self, field_name, file_name, *args, **kwargs):
+        super().new_file(field_name, file_name, *args, **kwargs)
+        self.active = field_name == self.field_name_to_handle
+        if not self.active:
+            return
+
+        name = get_valid_filename(PurePath(file_name).name)
+        self.relative_name = f"videos/uploads/{uuid.uuid4()}/{name}"
+        self.path = storage.local_path(self.relative_name)
+        self.hasher = new_hasher()
+        self.size = 0
+        self.fh = None
+        raise StopFutureHandlers()
+
+    def receive_data_chunk(self, raw_data, start):
+        if not self.active:
+            return raw_data
+
+        if self.fh is None:
+            if sniff_container(raw_data[:12]) is None:
+                self.active = False
+                self.rejected = self.file_name
+                raise SkipFile()
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.fh = open(self.path, "wb")
+
+        self.fh.write(raw_data)
+        self.hasher.update(raw_data)
+        self.size += len(raw_data)
+        return None
+
+    def file_complete(self, file_size):
+        if not self.active or self.fh is None:
+            return None
+        self.fh.close()
+        self.active = False
+        return StreamedVideoFile(
+            self.path,
+            self.relative_name,
+            self.size,
+            self.hasher.hexdigest(),
+            content_type=self.content_type,
+            charset=self.charset,
+        )
+
+    def upload_interrupted(self):
+        if self.fh is not None:
+            self.fh.close()
+        self.discard()
+
+    def discard(self) -> None:
+        """Remove whatever was written (failed validation, aborted upload)."""
+        if self.path is not None:
+            shutil.rmtree(self.path.parent, ignore_errors=True)
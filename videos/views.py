@@ -2,25 +2,58 @@
 
 from __future__ import annotations
 
+import fcntl
+import mimetypes
+import shutil
+from pathlib import Path, PurePosixPath
+
 from django.conf import settings
+from django.db import transaction
+from django.http import (
+    FileResponse,
+    Http404,
+    HttpResponse,
+    HttpResponseRedirect,
+    UnreadablePostError,
+)
 from django.utils.decorators import method_decorator
 from django.views.decorators.cache import cache_page
-from rest_framework import permissions, status, viewsets
+from rest_framework import mixins, permissions, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.generics import ListAPIView
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
-from .models import Video, WatchProgress
-from .serializers import ProgressSerializer, VideoSerializer
+from . import progress, storage
+from .models import ChunkedUpload, Video, WatchProgress
+from .serializers import ChunkedUploadSerializer, ProgressSerializer, VideoSerializer
+from .uploads import StreamedVideoFile, VideoUploadHandler
 
 __all__ = [
     "VideoViewSet",
     "ProgressViewSet",
     "TrailerList",
+    "ChunkedUploadViewSet",
+    "ProtectedMediaView",
 ]
 
 CACHE_TTL: int = getattr(settings, "CACHE_TTL", 60 * 15)
+UPLOAD_READ_BYTES: int = 1024 * 1024
+
+# Protected media: nginx serves the file from this internal location
+MEDIA_ACCEL_REDIRECT: bool = getattr(settings, "MEDIA_ACCEL_REDIRECT", True)
+MEDIA_ACCEL_PREFIX: str = getattr(settings, "MEDIA_ACCEL_PREFIX", "/protected-media/")
+PROTECTED_MEDIA_DIRS: tuple[str, ...] = ("videos", "thumbs", "hero")
+MEDIA_TYPES: dict[str, str] = {
+    ".m3u8": "application/vnd.apple.mpegurl",
+    ".m4s": "video/iso.segment",
+    ".vtt": "text/vtt",
+}
+MEDIA_CACHE_CONTROL: dict[str, str] = {
+    ".m4s": "private, max-age=31536000, immutable",
+    ".m3u8": "private, max-age=60",
+}
 
 
 @method_decorator(cache_page(CACHE_TTL), name="retrieve")
@@ -36,6 +69,36 @@ class VideoViewSet(viewsets.ModelViewSet):
             return Video.objects.filter(is_trailer=False)
         return Video.objects.all()
 
+    def create(self, request, *args, **kwargs):  # noqa: D401
+        """Create a video; the original is streamed once to its final path."""
+        self.upload_handler = VideoUploadHandler(request._request)
+        request.upload_handlers.insert(0, self.upload_handler)
+        try:
+            request.data  # parse now so rejected containers are known
+            if self.upload_handler.rejected:
+                return Response(
+                    {"video_file": ["Datei ist kein unterstütztes Videoformat."]},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            return super().create(request, *args, **kwargs)
+        except Exception:
+            self.upload_handler.discard()
+            raise
+
+    def perform_create(self, serializer):  # noqa: D401
+        """Point ``video_file`` at the streamed file instead of copying it."""
+        upload = serializer.validated_data.get("video_file")
+        if isinstance(upload, StreamedVideoFile):
+            serializer.save(**upload.publish())
+        else:
+            serializer.save()
+
+    @action(detail=True, url_path="progress", methods=["get"])
+    def progress(self, request, pk=None):  # noqa: D401
+        """Return live transcode progress per pipeline stage."""
+        video = self.get_object()
+        return Response({"video": video.id, "stages": progress.read(video.id)})
+
 
 class ProgressViewSet(viewsets.ModelViewSet):
     """Track per‑user playback progress."""
@@ -92,3 +155,194 @@ class TrailerList(ListAPIView):
     serializer_class = VideoSerializer
     queryset = Video.objects.filter(is_trailer=True, duration__lte=600)
     permission_classes = [IsAuthenticated]
+
+
+def upload_headers(upload: ChunkedUpload) -> dict[str, str]:
+    """tus-style headers describing the state of *upload*."""
+    return {
+        "Tus-Resumable": "1.0.0",
+        "Upload-Offset": str(upload.offset),
+        "Upload-Length": str(upload.size),
+        "Cache-Control": "no-store",
+    }
+
+
+def write_chunk(upload: ChunkedUpload, request, fh) -> int:
+    """Stream the raw request body into *fh* at ``upload.offset``.
+
+    The body is read in ``UPLOAD_READ_BYTES`` blocks, so memory stays flat
+    whatever the chunk size. Bytes that arrived before a dropped
+    connection are kept; returns the number of bytes written.
+    """
+    remaining = upload.size - upload.offset
+    written = 0
+    fh.seek(upload.offset)
+    fh.truncate()  # bytes of an earlier, unacknowledged chunk
+    try:
+        while written < remaining:
+            block = request.read(min(UPLOAD_READ_BYTES, remaining - written))
+            if not block:
+                break
+            fh.write(block)
+            written += len(block)
+    except (OSError, UnreadablePostError):
+        pass
+    fh.flush()
+    return written
+
+
+class ChunkedUploadViewSet(
+    mixins.CreateModelMixin,
+    mixins.RetrieveModelMixin,
+    mixins.DestroyModelMixin,
+    viewsets.GenericViewSet,
+):
+    """Resumable uploads of large originals (tus-style).
+
+    ``POST`` creates the upload, ``PATCH`` appends the raw body at the
+    ``Upload-Offset`` header, ``HEAD``/``GET`` report the offset to resume
+    from and ``POST …/finalize/`` turns the file into a :class:`Video`.
+    """
+
+    serializer_class = ChunkedUploadSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):  # noqa: D401
+        """Return uploads of the current user."""
+        return ChunkedUpload.objects.filter(user=self.request.user)
+
+    def perform_create(self, serializer):  # noqa: D401
+        """Create the empty target file next to the upload record."""
+        upload = serializer.save(user=self.request.user)
+        upload.path.parent.mkdir(parents=True, exist_ok=True)
+        upload.path.touch()
+
+    def create(self, request, *args, **kwargs):  # noqa: D401
+        """Start an upload and return its id, offset and ``Location``."""
+        response = super().create(request, *args, **kwargs)
+        upload = ChunkedUpload.objects.get(pk=response.data["id"])
+        for header, value in upload_headers(upload).items():
+            response[header] = value
+        response["Location"] = request.build_absolute_uri(f"{upload.pk}/")
+        return response
+
+    def retrieve(self, request, *args, **kwargs):  # noqa: D401
+        """Report the upload (``HEAD`` returns the headers only)."""
+        upload = self.get_object()
+        return Response(self.get_serializer(upload).data, headers=upload_headers(upload))
+
+    def partial_update(self, request, *args, **kwargs):  # noqa: D401
+        """Append one chunk; its ``Upload-Offset`` must match the server's."""
+        upload = self.get_object()
+        if upload.video_id:
+            return Response(
+                {"detail": "Upload ist bereits abgeschlossen."},
+                status=status.HTTP_409_CONFLICT,
+            )
+        try:
+            offset = int(request.headers["Upload-Offset"])
+        except (KeyError, ValueError):
+            return Response(
+                {"detail": "Header Upload-Offset fehlt oder ist ungültig."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if offset != upload.offset:
+            return Response(
+                {"detail": "Upload-Offset passt nicht zum Serverstand."},
+                status=status.HTTP_409_CONFLICT,
+                headers=upload_headers(upload),
+            )
+        if int(request.META.get("CONTENT_LENGTH") or 0) > upload.size - offset:
+            return Response(
+                {"detail": "Chunk überschreitet die angekündigte Dateigröße."},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            )
+
+        with open(upload.path, "r+b") as fh:
+            try:
+                fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return Response(
+                    {"detail": "Für diesen Upload läuft bereits ein Chunk."},
+                    status=status.HTTP_409_CONFLICT,
+                )
+            written = write_chunk(upload, request, fh)
+            ChunkedUpload.objects.filter(pk=upload.pk, offset=offset).update(
+                offset=offset + written,
+            )
+
+        upload.refresh_from_db()
+        return Response(status=status.HTTP_204_NO_CONTENT, headers=upload_headers(upload))
+
+    @action(detail=True, methods=["post"])
+    def finalize(self, request, pk=None):  # noqa: D401
+        """Create the :class:`Video` from the complete file and start the pipeline.
+
+        The upload row stays locked until the video is saved, so concurrent
+        calls create it only once; the pipeline starts after the commit.
+        """
+        upload = self.get_object()
+        with transaction.atomic():
+            upload = ChunkedUpload.objects.select_for_update().get(pk=upload.pk)
+            if upload.video_id is None:
+                if not upload.complete:
+                    return Response(
+                        {"detail": "Upload ist noch unvollständig."},
+                        status=status.HTTP_409_CONFLICT,
+                        headers=upload_headers(upload),
+                    )
+                storage.publish(upload.path.parent)
+                upload.video = Video.objects.create(
+                    title=upload.title,
+                    description=upload.description,
+                    category=upload.category,
+                    is_trailer=upload.is_trailer,
+                    video_file=upload.name,
+                )
+                upload.save(update_fields=["video", "updated"])
+
+        data = VideoSerializer(upload.video, context=self.get_serializer_context()).data
+        return Response(data, status=status.HTTP_201_CREATED)
+
+    def perform_destroy(self, instance: ChunkedUpload) -> None:  # noqa: D401
+        """Abort an unfinished upload and drop its partial file."""
+        if instance.video_id is None:
+            shutil.rmtree(instance.path.parent, ignore_errors=True)
+        instance.delete()
+
+
+class ProtectedMediaView(APIView):
+    """Authenticated access to renditions, HLS, thumbnails and hero frames.
+
+    Django only checks the user and the path; the bytes (including Range
+    requests) are sent by nginx from an ``internal`` location named in the
+    ``X-Accel-Redirect`` header. Without nginx (``MEDIA_ACCEL_REDIRECT =
+    False``) the file is streamed by Django instead; with remote storage
+    the client is redirected to a short-lived storage URL.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, path: str):  # noqa: D401
+        """Hand the file at *path* (relative to ``MEDIA_ROOT``) to nginx."""
+        rel = PurePosixPath(path)
+        if rel.is_absolute() or ".." in rel.parts or rel.parts[0] not in PROTECTED_MEDIA_DIRS:
+            raise Http404
+        if storage.is_remote():
+            return HttpResponseRedirect(storage.url(rel.as_posix()))
+        full = Path(settings.MEDIA_ROOT, *rel.parts)
+        if not full.is_file():
+            raise Http404
+
+        content_type = MEDIA_TYPES.get(rel.suffix) or (
+            mimetypes.guess_type(rel.name)[0] or "application/octet-stream"
+        )
+        if MEDIA_ACCEL_REDIRECT:
+            response = HttpResponse(content_type=content_type)
+            response["X-Accel-Redirect"] = MEDIA_ACCEL_PREFIX + rel.as_posix()
+            response["Accept-Ranges"] = "bytes"  # nginx answers Range itself
+        else:
+            # FileResponse ignores Range: always the full file, no Accept-Ranges
+            response = FileResponse(full.open("rb"), content_type=content_type)
+        response["Cache-Control"] = MEDIA_CACHE_CONTROL.get(rel.suffix, "private, max-age=3600")
+        return response